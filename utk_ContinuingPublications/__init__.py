@@ -0,0 +1,12 @@
+'''
+utk libraries Continuing Publications processing for Islandora ingest
+
+Entry-point scripts and notebooks import from here so every workflow shares 1
+ContinuingPublications_Volume and the stage backends registered in stages.py
+'''
+from utk_ContinuingPublications.common import get_formatted_extension, get_season_code
+from utk_ContinuingPublications.publications import (Alumnus, Commencements, ContinuingPublications_Publication,
+                                                     Phoenix, Playbills, SMHC_Handbook, Torchbearer,
+                                                     batch_process_playbills)
+from utk_ContinuingPublications.stages import get_stage_backend, register_stage_backend
+from utk_ContinuingPublications.volume import ContinuingPublications_Volume
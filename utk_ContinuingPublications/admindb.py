@@ -0,0 +1,191 @@
+import datetime
+import hashlib
+import json
+import os
+import socket
+import time
+from pathlib import Path
+
+from utk_ContinuingPublications.workqueue import take_over_stale_file
+
+# the store must be on the share all workstations use so 2 batches can never
+# reserve the same adminDB items, so there's no default store_path, e.g. use
+# Z:\ContinuingPublications\adminDB_reservations.json
+
+
+def check_store_path(store_path):
+    '''
+    -- Purpose --
+    Refuse a reservation store in the user's home directory, which only 1
+    workstation can see
+
+    -- Arguments --
+    store_path: type=Path-like object; JSON file with every reservation
+
+    -- Returns --
+    store_path: type=Path-like object; absolute store path
+
+    Raises ValueError if store_path is in the home directory
+    '''
+    store_path = Path(os.path.abspath(store_path))
+    home_path = Path(os.path.abspath(Path.home()))
+    if store_path.parts[:len(home_path.parts)] == home_path.parts:
+        raise ValueError(f'{store_path} is only on this workstation, keep the adminDB store on the shared drive')
+    return store_path
+
+
+def format_adminDB(collection, item):
+    '''
+    -- Purpose --
+    Format an adminDB identifier, e.g. 0012_003049_000875
+
+    -- Arguments --
+    collection: type=integer; adminDB collection number
+    item: type=integer; adminDB item number
+
+    -- Returns --
+    adminDB: type=string; adminDB identifier
+    '''
+    return f'0012_{str(collection).zfill(6)}_{str(item).zfill(6)}'
+
+
+class StoreLock:
+    '''Exclusive lock on the reservation store using a <store>.lock file'''
+
+    def __init__(self, store_path, timeout_seconds=60, stale_seconds=300):
+        self.lock_path = Path(f'{store_path}.lock')
+        self.timeout_seconds = timeout_seconds
+        self.stale_seconds = stale_seconds
+        self.worker_id = f'{socket.gethostname()}-{os.getpid()}'
+
+    def __enter__(self):
+        start_time = time.time()
+        while True:
+            try:
+                os.close(os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return self
+            except FileExistsError:
+                pass
+
+            # a lock left behind by a crashed batch
+            if take_over_stale_file(self.lock_path, self.stale_seconds, self.worker_id):
+                continue
+
+            if time.time() - start_time > self.timeout_seconds:
+                raise TimeoutError(f'Could not lock {self.lock_path}')
+            time.sleep(0.1)
+
+    def __exit__(self, *exc_info):
+        self.lock_path.unlink()
+
+
+def get_batch_key(directory_names_list):
+    # the same volumes always make the same key, any new volume makes a new one
+    names_text = '\n'.join(sorted(directory_names_list))
+    return hashlib.sha256(names_text.encode('utf-8')).hexdigest()
+
+
+def reserve_adminDB_range(collection, count, batch_name, store_path, first_item=None, batch_key=None):
+    '''
+    -- Purpose --
+    Reserve count contiguous adminDB item numbers in collection for a batch.
+    Reserving again with the same batch_key returns the same range, so a batch
+    can be re-run without using up new numbers.
+
+    -- Arguments --
+    collection: type=integer; adminDB collection number
+    count: type=integer; number of items to reserve
+    batch_name: type=string; name for the batch in the store, e.g. the root directory path
+    store_path: type=Path-like object; JSON file with every reservation, on the
+    shared drive
+    first_item: type=integer; lowest item number to hand out, e.g. the next free
+    item from adminDB when the store is first used for a collection
+    batch_key: type=string; identifies the batch's range, see get_batch_key(),
+    defaults to batch_name, which then has to be unique to the batch
+
+    -- Returns --
+    first_reserved_item: type=integer; first item number of the range
+
+    Raises ValueError if batch_key already reserved a different number of items,
+    or if store_path is in the home directory
+    '''
+    if batch_key is None:
+        batch_key = batch_name
+
+    store_path = check_store_path(store_path)
+    store_path.parents[0].mkdir(parents=True, exist_ok=True)
+
+    with StoreLock(store_path):
+        if store_path.is_file():
+            with open(store_path) as store_file:
+                store_dict = json.load(store_file)
+        else:
+            store_dict = {'collections': {}}
+
+        collection_dict = store_dict['collections'].setdefault(str(collection),
+                                                               {'next_item': 1, 'reservations': []})
+
+        for reservation in collection_dict['reservations']:
+            if reservation.get('key', reservation['batch']) != batch_key:
+                continue
+            reserved_count = reservation['last_item'] - reservation['first_item'] + 1
+            if reserved_count != count:
+                raise ValueError(f"{reservation['batch']} already reserved {reserved_count} items, not {count}")
+            return reservation['first_item']
+
+        first_reserved_item = collection_dict['next_item']
+        if first_item is not None:
+            first_reserved_item = max(first_reserved_item, first_item)
+
+        collection_dict['next_item'] = first_reserved_item + count
+        collection_dict['reservations'].append({
+            'batch': batch_name,
+            'key': batch_key,
+            'first_item': first_reserved_item,
+            'last_item': first_reserved_item + count - 1,
+            'reserved': datetime.datetime.now().isoformat(timespec='seconds')})
+
+        # write a new file then swap it in so a crash never leaves a broken store
+        temporary_store_path = store_path.with_name(f'{store_path.name}.tmp')
+        with open(temporary_store_path, 'w') as store_file:
+            json.dump(store_dict, store_file, indent=2)
+        temporary_store_path.replace(store_path)
+
+    print(f'Reserved adminDB items {first_reserved_item}-{first_reserved_item + count - 1} in collection {collection} for {batch_name}')
+
+    return first_reserved_item
+
+
+def allocate_adminDB_items(directory_paths_list, collection, store_path, first_item=None, batch_name=None):
+    '''
+    -- Purpose --
+    Assign every volume directory an adminDB item number, in sorted directory name
+    order, from 1 range reserved up front. Workers can then create YAML for any
+    volume in any order without coordinating. The range is keyed on the volume
+    names, so re-running the same volumes re-uses it and a new batch in the same
+    directory gets a new range.
+
+    -- Arguments --
+    directory_paths_list: type=list; Path-like objects, 1 per volume
+    collection: type=integer; adminDB collection number
+    store_path: type=Path-like object; JSON file with every reservation, on the
+    shared drive
+    first_item: type=integer; lowest item number to hand out
+    batch_name: type=string; name for the batch in the store, defaults to the absolute
+    path of the volumes' parent directory
+
+    -- Returns --
+    adminDB_items_dict: type=dictionary; item number per directory name
+    '''
+    if not directory_paths_list:
+        return {}
+
+    directory_names_list = sorted(Path(x).name for x in directory_paths_list)
+    if batch_name is None:
+        batch_name = os.path.abspath(Path(directory_paths_list[0]).parents[0])
+
+    first_reserved_item = reserve_adminDB_range(collection, len(directory_names_list), batch_name,
+                                                store_path, first_item,
+                                                batch_key=get_batch_key(directory_names_list))
+
+    return {name: item for item, name in enumerate(directory_names_list, start=first_reserved_item)}
@@ -0,0 +1,103 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import md5
+from pathlib import Path
+
+from utk_ContinuingPublications.io_scheduler import default_io_scheduler
+
+# bigger reads/writes mean fewer round trips to the network share and longer
+# sequential reads for the NAS
+chunk_size = 8 * 1024 * 1024
+
+
+def md5_file(file_path):
+    '''
+    -- Purpose --
+    Get the md5 hex digest of a file's contents
+
+    -- Arguments --
+    file_path: type=Path-like object; file to hash
+
+    -- Returns --
+    file_hash: type=string; md5 hex digest
+    '''
+    file_hash = md5()
+    with default_io_scheduler.transfer(file_path) as transfer, open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            transfer.add(len(chunk))
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def copy_file_with_md5(source_path, destination_path):
+    '''
+    -- Purpose --
+    Copy a file like shutil.copy2 while computing the md5 of the bytes read, so the
+    source is only read once
+
+    -- Arguments --
+    source_path: type=Path-like object; file to copy
+    destination_path: type=Path-like object; copy to create
+
+    -- Returns --
+    source_hash: type=string; md5 hex digest of the source file
+    '''
+    source_hash = md5()
+    with default_io_scheduler.transfer(source_path, destination_path) as transfer, \
+            open(source_path, 'rb') as source_file, open(destination_path, 'wb') as destination_file:
+        for chunk in iter(lambda: source_file.read(chunk_size), b''):
+            transfer.add(len(chunk))
+            source_hash.update(chunk)
+            destination_file.write(chunk)
+    shutil.copystat(source_path, destination_path)
+    return source_hash.hexdigest()
+
+
+def backup_directory(source_directory, backup_directory, workers=2):
+    '''
+    -- Purpose --
+    Copy every file in source_directory into backup_directory and verify each copy.
+    Source digests are computed while copying and each finished copy is re-read
+    and hashed by a background thread while the next file is being copied.
+
+    -- Arguments --
+    source_directory: type=Path-like object; directory to back up
+    backup_directory: type=Path-like object; backup directory, must NOT exist
+    workers: type=integer; number of threads verifying copies
+
+    -- Returns --
+    file_hashes_dict: type=dictionary; md5 hex digest per file path relative to
+    source_directory
+
+    Raises ValueError if any copy does not match its source
+    '''
+    source_directory_path = Path(source_directory)
+    backup_directory_path = Path(backup_directory)
+    backup_directory_path.mkdir()
+
+    file_hashes_dict = {}
+    verify_futures_dict = {}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for current_directory, directory_names_list, file_names_list in os.walk(source_directory_path):
+            directory_names_list.sort()
+            relative_directory_path = Path(current_directory).relative_to(source_directory_path)
+            output_directory_path = backup_directory_path.joinpath(relative_directory_path)
+            output_directory_path.mkdir(exist_ok=True)
+
+            for file_name in sorted(file_names_list):
+                relative_path = relative_directory_path.joinpath(file_name)
+                output_path = output_directory_path.joinpath(file_name)
+                file_hashes_dict[relative_path] = copy_file_with_md5(Path(current_directory, file_name), output_path)
+                verify_futures_dict[relative_path] = executor.submit(md5_file, output_path)
+
+        mismatched_paths_list = [relative_path for relative_path, future in verify_futures_dict.items()
+                                 if future.result() != file_hashes_dict[relative_path]]
+
+    if mismatched_paths_list:
+        for relative_path in mismatched_paths_list:
+            print(f'Backup does NOT match source: {relative_path}')
+        raise ValueError(f'{len(mismatched_paths_list)} files in {backup_directory_path} do not match {source_directory_path}')
+
+    return file_hashes_dict
@@ -0,0 +1,75 @@
+import hashlib
+
+from utk_ContinuingPublications.io_scheduler import default_io_scheduler
+
+
+def get_formatted_extension(from_extension, remediate=False):
+    '''
+    -- Purpose --
+    Returns an extension that:
+    1. has a period in the front
+    2. Optional: is lower-case
+    3. Optional: return jpeg as jpg and tiff as tif
+
+    -- Arguments --
+    from_extension: type=string; file extension with or without a '.'
+
+    -- Returns --
+    formatted_extension: type=string; formatted extension
+    '''
+    # make sure there's a period at the front of the extension
+    if from_extension.startswith('.'):  # do nothing
+        formatted_extension = from_extension
+    else:  # add a period
+        formatted_extension = f'.{from_extension}'
+
+    # make it lower-case
+    if remediate:
+        formatted_extension = formatted_extension.lower()
+        # hard-coded alterations for jpeg and tiff
+        if formatted_extension == '.jpeg':
+            formatted_extension = '.jpg'
+        elif formatted_extension == '.tiff':
+            formatted_extension = '.tif'
+
+    return formatted_extension
+
+
+def get_season_code(season):
+    '''
+    -- Purpose --
+    Get the EDTF season code for a season, e.g. spring -> 21
+
+    -- Arguments --
+    season: type=string; 'spring', 'summer', 'fall', or 'winter' (lower-case)
+
+    -- Returns --
+    season_code: type=string; 2-digit EDTF season code
+
+    Raises KeyError for any other season
+    '''
+    seasons_dict = {'spring': '21',
+                    'summer': '22',
+                    'fall': '23',
+                    'winter': '24'}
+    return seasons_dict[season]
+
+
+def get_file_hash(file_path, chunk_size=1024 * 1024):
+    '''
+    -- Purpose --
+    Get the SHA-256 hex digest of a file's contents
+
+    -- Arguments --
+    file_path: type=Path-like object; file to hash
+    chunk_size: type=integer; bytes to read at a time
+
+    -- Returns --
+    file_hash: type=string; hex digest
+    '''
+    file_hash = hashlib.sha256()
+    with default_io_scheduler.transfer(file_path) as transfer, open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            transfer.add(len(chunk))
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
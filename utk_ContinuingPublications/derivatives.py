@@ -0,0 +1,234 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from PIL import Image
+
+try:  # per-worker memory cap, not available on Windows
+    import resource
+except ImportError:
+    resource = None
+
+# Islandora book page datastream file names, the ingest server skips creating
+# any derivative it finds in the page sub-directory
+derivative_names_dict = {'JP2': 'JP2.jp2',
+                         'JPG': 'JPG.jpg',
+                         'TN': 'TN.jpg'}
+
+# Islandora defaults: medium JPG fits in 600x800, thumbnail fits in 200x200
+jpg_size = (600, 800)
+thumbnail_size = (200, 200)
+jpeg_quality = 90
+jp2_compression_ratio = 20
+
+# bytes per pixel a page needs while its derivatives are made: the decoded page, an
+# RGB copy, and the JP2 encoder's buffers. Used to keep pages over the memory cap
+# out of the workers where RLIMIT_AS can't cap them, i.e. on Windows
+bytes_per_pixel_estimate = 12
+
+
+def limit_worker_memory(memory_limit_mb):
+    '''
+    -- Purpose --
+    Cap the address space of the current process so a huge page raises MemoryError
+    in its worker instead of swapping the whole workstation. Runs once per worker.
+
+    -- Arguments --
+    memory_limit_mb: type=integer; memory cap in megabytes, None for no cap
+
+    -- Returns --
+    None
+    '''
+    if memory_limit_mb is None or resource is None:  # see get_oversized_pages()
+        return
+    memory_limit_bytes = memory_limit_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (memory_limit_bytes, memory_limit_bytes))
+
+
+def create_page_derivatives(image_path, overwrite=False):
+    '''
+    -- Purpose --
+    Create JP2, medium JPG and thumbnail derivatives next to a page TIFF
+
+    -- Arguments --
+    image_path: type=Path-like object; page TIFF in an ingest sub-directory
+    overwrite: type=boolean; re-create derivatives that already exist
+
+    -- Returns --
+    derivative_paths_list: type=list; Path-like objects of the derivatives created
+    '''
+    image_path = Path(image_path)
+    page_directory_path = image_path.parents[0]
+
+    derivative_paths_dict = {datastream: page_directory_path.joinpath(name)
+                             for datastream, name in derivative_names_dict.items()}
+    if not overwrite:
+        derivative_paths_dict = {datastream: path for datastream, path in derivative_paths_dict.items()
+                                 if not path.exists()}
+    if not derivative_paths_dict:
+        return []
+
+    with Image.open(image_path) as image:
+        # JPEG/JP2 need RGB or L, flatten anything else (palette, CMYK, 16-bit)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+
+        if 'JP2' in derivative_paths_dict:
+            image.save(derivative_paths_dict['JP2'],
+                       quality_mode='rates',
+                       quality_layers=[jp2_compression_ratio],
+                       irreversible=True)
+
+        # shrink once to the medium size (never enlarge), then make the thumbnail from that
+        width, height = image.size
+        scale = min(jpg_size[0] / width, jpg_size[1] / height, 1)
+        medium_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        medium_image = image.resize(medium_size, Image.LANCZOS, reducing_gap=3.0)
+
+    if 'JPG' in derivative_paths_dict:
+        medium_image.save(derivative_paths_dict['JPG'], quality=jpeg_quality)
+
+    if 'TN' in derivative_paths_dict:
+        medium_image.thumbnail(thumbnail_size, Image.LANCZOS)
+        medium_image.save(derivative_paths_dict['TN'], quality=jpeg_quality)
+
+    medium_image.close()
+
+    return list(derivative_paths_dict.values())
+
+
+def get_oversized_pages(image_paths_list, memory_limit_mb):
+    '''
+    -- Purpose --
+    Find pages whose derivatives would need more than memory_limit_mb, from the
+    image headers only
+
+    -- Arguments --
+    image_paths_list: type=list; Path-like objects of page TIFFs
+    memory_limit_mb: type=integer; memory cap per worker in megabytes
+
+    -- Returns --
+    errors_dict: type=dictionary; MemoryError per oversized page path
+    '''
+    errors_dict = {}
+    for image_path in image_paths_list:
+        try:
+            with Image.open(image_path) as image:  # header only
+                estimated_mb = image.width * image.height * bytes_per_pixel_estimate / 1024 / 1024
+        except OSError:  # the worker reports unreadable pages
+            continue
+        if estimated_mb > memory_limit_mb:
+            errors_dict[image_path] = MemoryError(f'needs about {estimated_mb:.0f} MB, '
+                                                  f'the cap is {memory_limit_mb} MB')
+    return errors_dict
+
+
+def run_derivatives_pool(image_paths_list, workers, memory_limit_mb, overwrite):
+    '''
+    -- Purpose --
+    Create derivatives for image_paths_list in 1 process pool
+
+    -- Arguments --
+    image_paths_list: type=list; Path-like objects of page TIFFs
+    workers: type=integer; number of worker processes
+    memory_limit_mb: type=integer; memory cap per worker in megabytes, None for no cap
+    overwrite: type=boolean; re-create derivatives that already exist
+
+    -- Returns --
+    (errors_dict, broken_image_paths_list): type=tuple; error per failed page path,
+    pages that didn't finish because a worker died, e.g. killed for using too much memory
+    '''
+    errors_dict = {}
+    broken_image_paths_list = []
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=limit_worker_memory,
+                             initargs=(memory_limit_mb,)) as executor:
+        futures_list = [executor.submit(create_page_derivatives, image_path, overwrite)
+                        for image_path in image_paths_list]
+        for image_path, future in zip(image_paths_list, futures_list):
+            try:
+                future.result()
+            except BrokenProcessPool:
+                broken_image_paths_list.append(image_path)
+            except (OSError, MemoryError) as error:
+                errors_dict[image_path] = error
+    return (errors_dict, broken_image_paths_list)
+
+
+def get_new_derivative_paths(image_path):
+    # derivatives of image_path that don't exist yet, i.e. the ones a run creates
+    page_directory_path = Path(image_path).parents[0]
+    return [page_directory_path.joinpath(name) for name in derivative_names_dict.values()
+            if not page_directory_path.joinpath(name).exists()]
+
+
+def create_derivatives(ingest_directory, workers=None, memory_limit_mb=2048, overwrite=False, journal=None):
+    '''
+    -- Purpose --
+    Create JP2, JPG and TN derivatives for every page of an Islandora ingest directory
+    in parallel, 1 page per task
+
+    -- Arguments --
+    ingest_directory: type=Path-like object; directory created by
+    create_islandora_ingest_directory with 1 NNNNNN/ sub-directory per page
+    workers: type=integer; number of worker processes, defaults to os.cpu_count()
+    memory_limit_mb: type=integer; memory cap per worker in megabytes, None for no cap
+    overwrite: type=boolean; re-create derivatives that already exist
+    journal: type=VolumeJournal; records every derivative created, so the volume's
+    restore() removes them
+
+    -- Returns --
+    failed_image_paths_list: type=list; Path-like objects of pages that failed
+    '''
+    ingest_directory_path = Path(ingest_directory)
+    image_paths_list = sorted(ingest_directory_path.glob('*/*.tif'))
+    number_of_images = len(image_paths_list)
+
+    if workers is None:
+        workers = os.cpu_count()
+
+    print(f'Creating derivatives for {number_of_images} pages in {ingest_directory_path.name} with {workers} workers')
+
+    new_derivative_paths_lists = [get_new_derivative_paths(x) for x in image_paths_list]
+
+    errors_dict = {}
+    if memory_limit_mb is not None and resource is None:
+        print(f'WARNING: the {memory_limit_mb} MB memory cap only limits workers on Linux and macOS, '
+              'here pages estimated to need more are skipped')
+        errors_dict = get_oversized_pages(image_paths_list, memory_limit_mb)
+
+    pool_errors_dict, broken_image_paths_list = run_derivatives_pool(
+        [x for x in image_paths_list if x not in errors_dict], workers, memory_limit_mb, overwrite)
+    errors_dict.update(pool_errors_dict)
+
+    # a dead worker breaks the pool and every page still queued in it, run them
+    # again in a fresh pool, then 1 at a time to find the page that kills its worker
+    if broken_image_paths_list:
+        print(f'WARNING: a worker died, retrying {len(broken_image_paths_list)} pages in a new pool')
+        pool_errors_dict, broken_image_paths_list = run_derivatives_pool(broken_image_paths_list, workers,
+                                                                         memory_limit_mb, overwrite)
+        errors_dict.update(pool_errors_dict)
+    for image_path in broken_image_paths_list:
+        pool_errors_dict, still_broken_list = run_derivatives_pool([image_path], 1, memory_limit_mb, overwrite)
+        errors_dict.update(pool_errors_dict)
+        if still_broken_list:
+            errors_dict[image_path] = BrokenProcessPool('the worker died creating this page, out of memory?')
+
+    failed_image_paths_list = []
+    for image_path, new_derivative_paths_list in zip(image_paths_list, new_derivative_paths_lists):
+        if image_path in errors_dict:
+            print(f'WARNING: derivatives failed for {image_path}: {errors_dict[image_path]!r}')
+            failed_image_paths_list.append(image_path)
+        # a failed page can still have written some derivatives
+        if journal is not None:
+            for derivative_path in new_derivative_paths_list:
+                if derivative_path.exists():
+                    journal.created(derivative_path)
+    if journal is not None:
+        journal.flush()
+
+    print(f' Created derivatives for {number_of_images - len(failed_image_paths_list)} pages')
+    print('')
+
+    return failed_image_paths_list
@@ -0,0 +1,164 @@
+import json
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from utk_ContinuingPublications.derivatives import limit_worker_memory
+
+# pages are shrunk to about this many pixels on the long side before scoring
+qa_size = 512
+# a pixel is "ink" if it is this far from the page's median gray value
+ink_threshold = 48
+# pages with less ink than this fraction of their pixels are probably blank
+blank_ink_fraction = 0.001
+# lowest resolution accepted for ingest
+min_dpi = 300
+
+# TIFF Orientation tag, 1 is "top-left", i.e. not rotated
+orientation_tag = 274
+
+
+def check_page(image_path):
+    '''
+    -- Purpose --
+    Read a page's header, then score a downsampled copy of its pixels
+    The header values come from PIL's lazy open, before any pixels are decoded
+
+    -- Arguments --
+    image_path: type=Path-like object; page image
+
+    -- Returns --
+    page_dict: type=dictionary; name, width, height, dpi, mode, bits, compression,
+    orientation, ink_fraction, std, and error (None if the page could be read)
+    '''
+    image_path = Path(image_path)
+    page_dict = {'name': image_path.name, 'width': None, 'height': None, 'dpi': None, 'mode': None,
+                 'bits': None, 'compression': None, 'orientation': None, 'ink_fraction': None,
+                 'std': None, 'error': None}
+
+    try:
+        with Image.open(image_path) as image:
+            # header only, nothing is decoded yet
+            page_dict['width'], page_dict['height'] = image.size
+            page_dict['mode'] = image.mode
+            page_dict['compression'] = image.info.get('compression')
+            dpi = image.info.get('dpi')
+            if dpi:
+                page_dict['dpi'] = round(float(dpi[0]))
+            tags = getattr(image, 'tag_v2', {})
+            bits = tags.get(258)
+            page_dict['bits'] = bits[0] if isinstance(bits, tuple) else bits
+            page_dict['orientation'] = tags.get(orientation_tag)
+
+            # shrink first so the scores are computed on ~qa_size x qa_size pixels
+            factor = max(1, max(image.size) // qa_size)
+            if image.mode.startswith('I;16'):  # PIL clips 16-bit to white when converting to L
+                pixels = (np.asarray(image)[::factor, ::factor] >> 8).astype(np.int16)
+            else:
+                if image.mode not in ('L', 'RGB'):
+                    image = image.convert('RGB' if len(image.getbands()) >= 3 else 'L')
+                with image.reduce(factor).convert('L') as small_image:
+                    pixels = np.asarray(small_image, dtype=np.int16)
+
+        background = np.median(pixels)
+        page_dict['ink_fraction'] = float(np.mean(np.abs(pixels - background) > ink_threshold))
+        page_dict['std'] = float(pixels.std())
+    except (OSError, ValueError, MemoryError) as error:
+        page_dict['error'] = f'{type(error).__name__}: {error}'
+
+    return page_dict
+
+
+def get_qa_report(page_dicts_list):
+    '''
+    -- Purpose --
+    Compare every page with the volume and sort the problems into failures, which
+    block ingest, and warnings, which only need a look
+
+    Failures: unreadable pages, missing or low DPI, DPI different from most pages,
+    rotated by the Orientation tag
+    Warnings: probably blank pages, landscape pages in a portrait volume (or the
+    other way around), e.g. a fold-out or a page scanned sideways
+
+    -- Arguments --
+    page_dicts_list: type=list; dictionaries from check_page(), in page order
+
+    -- Returns --
+    report_dict: type=dictionary; pages, expected_dpi, failures_list, warnings_list
+    '''
+    readable_page_dicts_list = [x for x in page_dicts_list if x['error'] is None]
+    dpi_counter = Counter(x['dpi'] for x in readable_page_dicts_list if x['dpi'])
+    expected_dpi = dpi_counter.most_common(1)[0][0] if dpi_counter else None
+    landscape_pages = sum(x['width'] > x['height'] for x in readable_page_dicts_list)
+    mostly_landscape = landscape_pages > len(readable_page_dicts_list) / 2
+
+    failures_list = []
+    warnings_list = []
+    for page_dict in page_dicts_list:
+        name = page_dict['name']
+        if page_dict['error'] is not None:
+            failures_list.append(f"{name}: can't be read ({page_dict['error']})")
+            continue
+        if page_dict['dpi'] is None:
+            failures_list.append(f'{name}: no DPI')
+        elif page_dict['dpi'] < min_dpi:
+            failures_list.append(f"{name}: {page_dict['dpi']} DPI is below {min_dpi}")
+        elif page_dict['dpi'] != expected_dpi:
+            failures_list.append(f"{name}: {page_dict['dpi']} DPI, most pages are {expected_dpi}")
+        if page_dict['orientation'] not in (None, 1):
+            failures_list.append(f"{name}: rotated by Orientation tag {page_dict['orientation']}")
+        if page_dict['ink_fraction'] < blank_ink_fraction:
+            warnings_list.append(f'{name}: probably blank')
+        if (page_dict['width'] > page_dict['height']) != mostly_landscape:
+            warnings_list.append(f"{name}: {'landscape' if not mostly_landscape else 'portrait'} page")
+
+    return {'pages': page_dicts_list,
+            'expected_dpi': expected_dpi,
+            'failures_list': failures_list,
+            'warnings_list': warnings_list}
+
+
+def qa_pages(image_paths_list, report_path=None, workers=None, memory_limit_mb=2048):
+    '''
+    -- Purpose --
+    Check every page of a volume in parallel, 1 page per task, and optionally write
+    the report as JSON
+
+    -- Arguments --
+    image_paths_list: type=list; Path-like objects of the pages in page order
+    report_path: type=Path-like object; optional .json file for the report
+    workers: type=integer; number of worker processes, defaults to os.cpu_count()
+    memory_limit_mb: type=integer; memory cap per worker in megabytes, None for no cap
+
+    -- Returns --
+    report_dict: type=dictionary; see get_qa_report()
+    '''
+    if workers is None:
+        workers = os.cpu_count()
+
+    print(f'Checking {len(image_paths_list)} pages with {workers} workers')
+
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=limit_worker_memory,
+                             initargs=(memory_limit_mb,)) as executor:
+        page_dicts_list = list(executor.map(check_page, image_paths_list, chunksize=4))
+
+    report_dict = get_qa_report(page_dicts_list)
+
+    for warning in report_dict['warnings_list']:
+        print(f'WARNING: {warning}')
+    for failure in report_dict['failures_list']:
+        print(f'FAILED: {failure}')
+    print(f" {len(report_dict['failures_list'])} failures, {len(report_dict['warnings_list'])} warnings")
+
+    if report_path is not None:
+        with open(report_path, 'w') as report_file:
+            json.dump(report_dict, report_file, indent=2)
+        print(f' QA report written to {report_path}')
+    print('')
+
+    return report_dict
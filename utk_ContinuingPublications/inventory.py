@@ -0,0 +1,223 @@
+import csv
+import os
+import re
+from pathlib import Path
+
+try:  # only needed for Parquet output
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+from utk_ContinuingPublications.workqueue import queue_directory_name
+
+page_extensions_list = ['.tif', '.tiff', '.jp2', '.jpg', '.jpeg']
+
+# Islandora book ingest page directories, e.g. 000001
+page_directory_pattern = re.compile(r'^\d{6}$')
+# playbill directories start with the date, e.g. 2018-10-04_It's_a_Wonderful_Life
+date_pattern = re.compile(r'^\d{4}-\d{2}-\d{2}_')
+
+inventory_columns_list = ['path', 'volume', 'publication_type', 'state', 'pages', 'pdfs', 'size_bytes']
+summary_columns_list = ['publication_type', 'volumes', 'pages', 'pdfs', 'size_bytes']
+
+
+def get_publication_type(volume_name):
+    '''
+    -- Purpose --
+    Get the publication type from a volume directory name, e.g.
+    torchbearer_v53-n2_2018-fall -> torchbearer, 2018-10-04_Some_Play -> playbills
+
+    -- Arguments --
+    volume_name: type=string; volume directory name
+
+    -- Returns --
+    publication_type: type=string; lower-case publication type
+    '''
+    if date_pattern.match(volume_name):
+        return 'playbills'
+    return volume_name.split('_', maxsplit=1)[0].lower()
+
+
+def get_volume_state(directory_path, file_names_list, has_page_directories, done_names_set):
+    '''
+    -- Purpose --
+    Work out how far a volume has gone through the pipeline from what's on disk
+
+    -- Arguments --
+    directory_path: type=string; volume directory
+    file_names_list: type=list; page file names directly in the volume
+    has_page_directories: type=boolean; True if the pages are in 000001/, 000002/, etc.
+    done_names_set: type=set; volume names with a work queue .done marker in the parent
+
+    -- Returns --
+    state: type=string; backup, packaged, ingest_layout, done, renamed, or scanned
+    '''
+    volume_name = os.path.basename(directory_path)
+    if volume_name.endswith('_backup'):
+        return 'backup'
+    if has_page_directories:
+        if os.path.basename(os.path.dirname(directory_path)) == 'book':
+            return 'packaged'
+        return 'ingest_layout'
+    if volume_name in done_names_set:
+        return 'done'
+    if file_names_list and all(x.upper().startswith(f'{volume_name.upper()}_') for x in file_names_list):
+        return 'renamed'
+    return 'scanned'
+
+
+def iter_inventory_rows(root_directory):
+    '''
+    -- Purpose --
+    Walk root_directory with os.scandir and yield 1 row per volume, i.e. per
+    directory with page images or PDFs in it or in 000001/, 000002/, etc.
+    Only the directory being read is held in memory, so the walk uses the same
+    memory for 100 volumes or 100,000
+
+    -- Arguments --
+    root_directory: type=Path-like object; e.g. Z:\\ContinuingPublications
+
+    -- Returns --
+    generator of dictionaries with the keys in inventory_columns_list
+    '''
+    # (directory, names with a .done marker in its parent's work queue)
+    directory_paths_list = [(str(root_directory), frozenset())]
+
+    while directory_paths_list:
+        directory_path, parent_done_names_set = directory_paths_list.pop()
+
+        page_names_list = []
+        pdfs = 0
+        size_bytes = 0
+        page_directory_paths_list = []
+        sub_directory_paths_list = []
+        done_names_set = frozenset()
+
+        try:
+            entries = os.scandir(directory_path)
+        except (FileNotFoundError, PermissionError) as error:  # moved or locked while walking
+            print(f'WARNING: skipping {directory_path}: {error}')
+            continue
+
+        with entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    if entry.name == queue_directory_name:
+                        done_names_set = frozenset(x[:-len('.done')] for x in os.listdir(entry.path)
+                                                   if x.endswith('.done'))
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    if page_directory_pattern.match(entry.name):
+                        page_directory_paths_list.append(entry.path)
+                    else:
+                        sub_directory_paths_list.append(entry.path)
+                    continue
+                extension = os.path.splitext(entry.name)[1].lower()
+                if extension in page_extensions_list:
+                    page_names_list.append(entry.name)
+                elif extension == '.pdf':
+                    pdfs += 1
+                size_bytes += entry.stat(follow_symlinks=False).st_size
+
+        # reversed so the stack hands them out in sorted order
+        for sub_directory_path in sorted(sub_directory_paths_list, reverse=True):
+            directory_paths_list.append((sub_directory_path, done_names_set))
+
+        pages = len(page_names_list)
+        for page_directory_path in page_directory_paths_list:
+            with os.scandir(page_directory_path) as page_entries:
+                for page_entry in page_entries:
+                    if page_entry.is_file(follow_symlinks=False):
+                        size_bytes += page_entry.stat(follow_symlinks=False).st_size
+            pages += 1
+
+        if pages == 0 and pdfs == 0:  # not a volume, e.g. the root or "book"
+            continue
+
+        volume_name = os.path.basename(directory_path)
+        yield {'path': directory_path,
+               'volume': volume_name,
+               'publication_type': get_publication_type(volume_name),
+               'state': get_volume_state(directory_path, page_names_list, bool(page_directory_paths_list),
+                                         parent_done_names_set),
+               'pages': pages,
+               'pdfs': pdfs,
+               'size_bytes': size_bytes}
+
+
+def export_inventory(root_directory, output_path, summary_path=None, parquet_batch_size=10000):
+    '''
+    -- Purpose --
+    Write the inventory of root_directory to CSV (opens in Google Sheets and Excel)
+    or Parquet, 1 row at a time, and optionally a summary per publication type
+
+    -- Arguments --
+    root_directory: type=Path-like object; e.g. Z:\\ContinuingPublications
+    output_path: type=Path-like object; .csv or .parquet file to create
+    summary_path: type=Path-like object; optional .csv file for the summary
+    parquet_batch_size: type=integer; rows held in memory per Parquet row group
+
+    -- Returns --
+    summary_dict: type=dictionary; publication type -> dictionary with the keys in
+    summary_columns_list, plus 1 count per state; backups are only counted by state
+    '''
+    output_path = Path(output_path)
+    summary_dict = {}
+
+    def add_to_summary(row):
+        publication_summary_dict = summary_dict.setdefault(row['publication_type'],
+                                                           {'publication_type': row['publication_type'],
+                                                            'volumes': 0, 'pages': 0, 'pdfs': 0, 'size_bytes': 0})
+        publication_summary_dict[row['state']] = publication_summary_dict.get(row['state'], 0) + 1
+        if row['state'] == 'backup':  # don't count pages twice
+            return
+        publication_summary_dict['volumes'] += 1
+        publication_summary_dict['pages'] += row['pages']
+        publication_summary_dict['pdfs'] += row['pdfs']
+        publication_summary_dict['size_bytes'] += row['size_bytes']
+
+    number_of_rows = 0
+    print(f'Writing inventory of {root_directory} to {output_path} . . .')
+
+    if output_path.suffix.lower() == '.parquet':
+        if pyarrow is None:
+            raise RuntimeError('Install pyarrow to write Parquet, or use a .csv output_path')
+        schema = pyarrow.schema([('path', pyarrow.string()), ('volume', pyarrow.string()),
+                                 ('publication_type', pyarrow.string()), ('state', pyarrow.string()),
+                                 ('pages', pyarrow.int64()), ('pdfs', pyarrow.int64()),
+                                 ('size_bytes', pyarrow.int64())])
+        rows_list = []
+        with pyarrow.parquet.ParquetWriter(str(output_path), schema) as parquet_writer:
+            for row in iter_inventory_rows(root_directory):
+                add_to_summary(row)
+                rows_list.append(row)
+                number_of_rows += 1
+                if len(rows_list) >= parquet_batch_size:
+                    parquet_writer.write_table(pyarrow.Table.from_pylist(rows_list, schema=schema))
+                    rows_list = []
+            if rows_list:
+                parquet_writer.write_table(pyarrow.Table.from_pylist(rows_list, schema=schema))
+    else:
+        with open(output_path, 'w', newline='', encoding='utf-8') as csv_file:
+            csv_writer = csv.DictWriter(csv_file, fieldnames=inventory_columns_list)
+            csv_writer.writeheader()
+            for row in iter_inventory_rows(root_directory):
+                add_to_summary(row)
+                csv_writer.writerow(row)
+                number_of_rows += 1
+                if number_of_rows % 1000 == 0:
+                    print(f' {number_of_rows} volumes . . .')
+
+    print(f'{number_of_rows} volumes in {len(summary_dict)} publication types')
+
+    if summary_path is not None:
+        states_list = sorted({key for x in summary_dict.values() for key in x} - set(summary_columns_list))
+        with open(summary_path, 'w', newline='', encoding='utf-8') as csv_file:
+            csv_writer = csv.DictWriter(csv_file, fieldnames=summary_columns_list + states_list, restval=0)
+            csv_writer.writeheader()
+            for publication_type in sorted(summary_dict):
+                csv_writer.writerow(summary_dict[publication_type])
+        print(f'Summary written to {summary_path}')
+
+    return summary_dict
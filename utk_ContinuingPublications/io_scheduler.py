@@ -0,0 +1,252 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+
+# directories whose device is remembered, 1 stat per directory instead of per transfer
+device_cache_size = 4096
+
+
+@lru_cache(maxsize=device_cache_size)
+def get_directory_device_id(directory_path):
+    # st_dev of directory_path or its closest existing parent, cached per directory
+    for candidate_path in [directory_path] + list(directory_path.parents):
+        try:
+            return os.stat(candidate_path).st_dev
+        except FileNotFoundError:
+            continue
+    raise FileNotFoundError(directory_path)
+
+
+def get_device_id(path):
+    '''
+    -- Purpose --
+    Get the id of the disk or share that path is on, i.e. st_dev of the directory
+    path is in, or its closest existing parent, so files that don't exist yet can
+    be scheduled. Files are taken to be on their directory's device, so the device
+    is looked up once per directory.
+
+    -- Arguments --
+    path: type=Path-like object; file
+
+    -- Returns --
+    device_id: type=integer; st_dev
+    '''
+    return get_directory_device_id(Path(path).absolute().parents[0])
+
+
+class Device:
+    '''
+    Concurrency limit, rate limit, and throughput window for 1 disk or share
+
+    The limit starts at initial_concurrency and hill-climbs between min_concurrency
+    and max_concurrency: every adapt_every transfers the throughput of the window is
+    compared with the previous window, keep going if it got better, turn around if
+    it got worse.
+    '''
+
+    def __init__(self, initial_concurrency, min_concurrency, max_concurrency, adapt_every):
+        self.condition = threading.Condition()
+        self.limit = initial_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.adapt_every = adapt_every
+        self.active = 0
+        self.direction = 1
+
+        # token bucket, bytes_per_second is None for no rate limit
+        self.bytes_per_second = None
+        self.tokens = 0
+        self.last_refill = time.monotonic()
+
+        # throughput window
+        self.window_started = time.monotonic()
+        self.window_bytes = 0
+        self.window_transfers = 0
+        self.previous_throughput = None
+
+    def acquire(self):
+        with self.condition:
+            while self.active >= self.limit:
+                self.condition.wait()
+            self.active += 1
+
+    def release(self, number_of_bytes):
+        with self.condition:
+            self.active -= 1
+            self.window_bytes += number_of_bytes
+            self.window_transfers += 1
+            if self.window_transfers >= self.adapt_every:
+                self.adapt()
+            self.condition.notify_all()
+
+    def adapt(self):
+        # called with self.condition held
+        elapsed = max(time.monotonic() - self.window_started, 1e-6)
+        throughput = self.window_bytes / elapsed
+
+        if self.previous_throughput is not None and throughput < self.previous_throughput * 0.95:
+            self.direction = -self.direction  # worse, turn around
+        self.limit = min(max(self.limit + self.direction, self.min_concurrency), self.max_concurrency)
+        # bounce off the ends instead of sticking to them
+        if self.limit in (self.min_concurrency, self.max_concurrency):
+            self.direction = 1 if self.limit == self.min_concurrency else -1
+
+        self.previous_throughput = throughput
+        self.window_started = time.monotonic()
+        self.window_bytes = 0
+        self.window_transfers = 0
+
+    def throttle(self, number_of_bytes):
+        # block until number_of_bytes may be transferred under the rate limit
+        if self.bytes_per_second is None:
+            return
+        with self.condition:
+            now = time.monotonic()
+            # allow up to 1 second of burst
+            self.tokens = min(self.tokens + (now - self.last_refill) * self.bytes_per_second, self.bytes_per_second)
+            self.last_refill = now
+            self.tokens -= number_of_bytes
+            wait_seconds = -self.tokens / self.bytes_per_second if self.tokens < 0 else 0
+        if wait_seconds:
+            time.sleep(wait_seconds)
+
+
+class Transfer:
+    '''Handed to the caller of IOScheduler.transfer() to report bytes as they move'''
+
+    def __init__(self, devices_list):
+        self.devices_list = devices_list
+        self.number_of_bytes = 0
+
+    def add(self, number_of_bytes):
+        '''
+        -- Purpose --
+        Count bytes read or written, waiting if a device is over its rate limit
+
+        -- Arguments --
+        number_of_bytes: type=integer; bytes just read or about to be written
+
+        -- Returns --
+        None
+        '''
+        self.number_of_bytes += number_of_bytes
+        for device in self.devices_list:
+            device.throttle(number_of_bytes)
+
+
+class IOScheduler:
+    '''
+    Limits how many file transfers run at once on each disk or share, so stages
+    that copy, hash, and zip in parallel don't thrash the NAS the scanning
+    stations also write to
+
+    Whole files are transferred by 1 thread in large chunks, so each transfer is a
+    sequential read. Limits are per process; worker processes each get their own.
+
+    Only the transfers that go through transfer() are limited: backups, page copies,
+    hashing, Zip files, and the raster cache. Pages read by the process pools for
+    page QA, derivatives, and PDF inspection, and by Tesseract for OCR, are out of
+    scope, so while those stages run a device can see more than its limit. Size
+    their pools with their workers arguments instead.
+
+    Example:
+    with default_io_scheduler.transfer(source_path, destination_path) as transfer:
+        ...
+        transfer.add(len(chunk))
+    '''
+
+    def __init__(self, initial_concurrency=2, min_concurrency=1, max_concurrency=6, adapt_every=16):
+        self.initial_concurrency = initial_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.adapt_every = adapt_every
+        self.lock = threading.Lock()
+        # st_dev -> Device
+        self.devices_dict = {}
+
+    def get_device(self, path):
+        device_id = get_device_id(path)
+        with self.lock:
+            if device_id not in self.devices_dict:
+                self.devices_dict[device_id] = Device(self.initial_concurrency, self.min_concurrency,
+                                                      self.max_concurrency, self.adapt_every)
+            return self.devices_dict[device_id]
+
+    def set_rate_limit(self, path, megabytes_per_second):
+        '''
+        -- Purpose --
+        Cap the bytes per second moved on the disk or share that path is on
+
+        -- Arguments --
+        path: type=Path-like object; any path on the disk or share
+        megabytes_per_second: type=number; None to remove the limit
+
+        -- Returns --
+        None
+        '''
+        device = self.get_device(path)
+        with device.condition:
+            if megabytes_per_second is None:
+                device.bytes_per_second = None
+            else:
+                device.bytes_per_second = megabytes_per_second * 1024 * 1024
+                device.tokens = device.bytes_per_second
+
+    def set_concurrency(self, path, max_concurrency, min_concurrency=1):
+        '''
+        -- Purpose --
+        Set how many transfers can run at once on the disk or share that path is on,
+        use the same value for both to turn off adapting
+
+        -- Arguments --
+        path: type=Path-like object; any path on the disk or share
+        max_concurrency: type=integer; most transfers at once
+        min_concurrency: type=integer; fewest transfers at once when adapting
+
+        -- Returns --
+        None
+        '''
+        device = self.get_device(path)
+        with device.condition:
+            device.max_concurrency = max_concurrency
+            device.min_concurrency = min_concurrency
+            device.limit = min(max(device.limit, min_concurrency), max_concurrency)
+            device.condition.notify_all()
+
+    @contextmanager
+    def transfer(self, *paths):
+        '''
+        -- Purpose --
+        Wait for a free slot on the devices of every path, e.g. source and destination,
+        and hold it while the caller reads or writes
+
+        -- Arguments --
+        paths: type=Path-like objects; files the transfer reads or writes
+
+        -- Returns --
+        transfer: type=Transfer; call transfer.add(number_of_bytes) as bytes move
+        '''
+        # take slots in the same order everywhere so 2 transfers can't deadlock
+        devices_dict = {}
+        for path in paths:
+            device = self.get_device(path)
+            devices_dict[id(device)] = device
+        devices_list = [devices_dict[x] for x in sorted(devices_dict)]
+
+        acquired_list = []
+        transfer = Transfer(devices_list)
+        try:
+            for device in devices_list:
+                device.acquire()
+                acquired_list.append(device)
+            yield transfer
+        finally:
+            for device in acquired_list:
+                device.release(transfer.number_of_bytes)
+
+
+# shared by every stage in the process
+default_io_scheduler = IOScheduler()
@@ -0,0 +1,347 @@
+import datetime
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+# journals are kept in a hidden directory next to the volumes, 1 file per volume
+journal_directory_name = '.volume_journals'
+
+# every volume processed by this process is recorded under the same run id, so a
+# whole batch can be rolled back together
+current_run_id = f"{datetime.datetime.now().strftime('%Y-%m-%d_%H%M%S')}_{os.getpid()}"
+
+
+class VolumeJournal:
+    '''
+    Records every file and directory a volume's pipeline renames or creates, 1 JSON
+    line per operation, so restore_volume() can put back exactly what changed with
+    renames, deletes of created files, and rmdirs instead of deleting the volume
+    and renaming its backup
+
+    Paths are recorded absolute. Entries are buffered and written to the share in 1
+    write by flush(), e.g. once per stage, except that renames and mkdirs are
+    written ahead: flushed before they happen, so a crash never leaves a change the
+    journal doesn't know about. One that then fails is recorded as 'cancel'.
+    '''
+
+    def __init__(self, volume_path, run_id=None):
+        volume_path = Path(os.path.abspath(volume_path))
+        self.journal_path = volume_path.parents[0].joinpath(journal_directory_name, f'{volume_path.name}.jsonl')
+        self.run_id = current_run_id if run_id is None else run_id
+        self.lock = threading.Lock()
+        self.journal_file = None
+        self.pending_lines_list = []
+
+    def record(self, operation, path, target=None):
+        '''
+        -- Purpose --
+        Add an operation to the journal, written by the next flush()
+
+        -- Arguments --
+        operation: type=string; 'rename', 'mkdir', 'create', or 'cancel' for a
+        rename or mkdir recorded ahead that didn't happen
+        path: type=Path-like object; the path renamed, created, or made
+        target: type=Path-like object; new path for 'rename'
+
+        -- Returns --
+        None
+        '''
+        # time orders the volumes of a run for rollback_run()
+        entry_dict = {'run': self.run_id, 'operation': operation, 'path': os.path.abspath(path),
+                      'time': round(time.time(), 6)}
+        if target is not None:
+            entry_dict['target'] = os.path.abspath(target)
+        with self.lock:
+            self.pending_lines_list.append(json.dumps(entry_dict) + '\n')
+
+    def flush(self):
+        # write the buffered entries to the journal in 1 write
+        with self.lock:
+            if not self.pending_lines_list:
+                return
+            if self.journal_file is None:  # no journal for volumes that are only read
+                self.journal_path.parents[0].mkdir(exist_ok=True)
+                self.journal_file = open(self.journal_path, 'a')
+            self.journal_file.write(''.join(self.pending_lines_list))
+            self.journal_file.flush()
+            self.pending_lines_list = []
+
+    def rename(self, source_path, target_path):
+        # like Path.replace, recorded ahead
+        self.rename_all([(source_path, target_path)])
+
+    def rename_all(self, renames_list):
+        '''
+        -- Purpose --
+        Rename each (source, target) pair in order like Path.replace, with every
+        rename written to the journal in 1 flush before the first one happens
+
+        -- Arguments --
+        renames_list: type=list; (source Path, target Path) tuples
+
+        -- Returns --
+        None
+        '''
+        for source_path, target_path in renames_list:
+            self.record('rename', source_path, target_path)
+        self.flush()
+        for source_path, target_path in renames_list:
+            try:
+                os.replace(source_path, target_path)
+            except BaseException:
+                # the renames after it never happen, restore_volume() skips those
+                self.record('cancel', source_path, target_path)
+                self.flush()
+                raise
+
+    def mkdir(self, directory_path, exist_ok=False):
+        # make a directory recorded ahead, True if it was made, see mkdir_all()
+        return self.mkdir_all([directory_path], exist_ok)[0]
+
+    def mkdir_all(self, directory_paths_list, exist_ok=False):
+        '''
+        -- Purpose --
+        Make each directory in order, with every mkdir written to the journal in 1
+        flush before the first one happens. A directory that already existed is
+        recorded as cancelled so restore_volume() leaves it alone.
+
+        -- Arguments --
+        directory_paths_list: type=list; Path-like objects of directories to make
+        exist_ok: type=boolean; don't raise FileExistsError if one exists
+
+        -- Returns --
+        created_list: type=list; True per directory that was made
+        '''
+        for directory_path in directory_paths_list:
+            self.record('mkdir', directory_path)
+        self.flush()
+        created_list = []
+        for directory_path in directory_paths_list:
+            try:
+                os.mkdir(directory_path)
+            except BaseException as error:
+                self.record('cancel', directory_path)
+                if isinstance(error, FileExistsError) and exist_ok:
+                    created_list.append(False)
+                    continue
+                self.flush()
+                raise
+            created_list.append(True)
+        self.flush()
+        return created_list
+
+    def created(self, file_path):
+        # record a file the caller just wrote
+        self.record('create', file_path)
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            if self.journal_file is not None:
+                self.journal_file.close()
+                self.journal_file = None
+
+
+def read_journal(journal_path):
+    # a crash can leave a half-written last line
+    entries_list = []
+    with open(journal_path) as journal_file:
+        for line in journal_file:
+            try:
+                entries_list.append(json.loads(line))
+            except json.JSONDecodeError:
+                pass
+    return entries_list
+
+
+def drop_cancelled_entries(entries_list):
+    # remove each 'cancel' and the rename or mkdir it cancels, the latest one before it
+    kept_entries_list = []
+    for entry_dict in entries_list:
+        if entry_dict['operation'] != 'cancel':
+            kept_entries_list.append(entry_dict)
+            continue
+        for index in range(len(kept_entries_list) - 1, -1, -1):
+            cancelled_dict = kept_entries_list[index]
+            if cancelled_dict['operation'] in ('rename', 'mkdir') and \
+                    (cancelled_dict['run'], cancelled_dict['path'], cancelled_dict.get('target')) == \
+                    (entry_dict['run'], entry_dict['path'], entry_dict.get('target')):
+                del kept_entries_list[index]
+                break
+    return kept_entries_list
+
+
+def get_restore_collisions(entries_list):
+    '''
+    -- Purpose --
+    Play the renames of entries_list backwards without touching anything and list
+    every rename that would land on a path taken since. Paths are compared
+    case-insensitively, like plan_directory_renames(), so the check is safe on
+    Windows and macOS shares.
+
+    -- Arguments --
+    entries_list: type=list; journal entries to undo, oldest first
+
+    -- Returns --
+    collisions_list: type=list; 1 message per rename that can't be undone
+    '''
+    # path key -> exists, for paths an earlier undo step moved, else ask the disk
+    exists_dict = {}
+
+    def exists(path):
+        return exists_dict.get(path.casefold(), os.path.lexists(path))
+
+    collisions_list = []
+    for entry_dict in reversed(entries_list):
+        if entry_dict['operation'] == 'rename':
+            if entry_dict['path'].casefold() == entry_dict['target'].casefold():
+                continue  # renamed onto itself, or a case-only rename
+            if not exists(entry_dict['target']):
+                continue  # never happened, or already moved back by an interrupted restore
+            if exists(entry_dict['path']):
+                # carry on as if it was moved back, so only this rename is reported
+                collisions_list.append(f"{entry_dict['target']} -> {entry_dict['path']}: "
+                                       f"{entry_dict['path']} exists")
+            exists_dict[entry_dict['target'].casefold()] = False
+            exists_dict[entry_dict['path'].casefold()] = True
+        else:  # created files and made directories are removed
+            exists_dict[entry_dict['path'].casefold()] = False
+    return collisions_list
+
+
+def restore_volume(journal_path, run_id=None):
+    '''
+    -- Purpose --
+    Undo the operations in a volume journal, newest first: renames go back, created
+    files are deleted, made directories are removed if they're empty. Nothing is
+    copied, and backups made by backup_volume() are left alone.
+
+    -- Arguments --
+    journal_path: type=Path-like object; <directory>/.volume_journals/<volume>.jsonl
+    run_id: type=string; only undo this run, None to undo every run in the journal
+
+    -- Returns --
+    number_of_operations: type=integer; number of operations undone
+
+    Raises FileExistsError listing every collision, before undoing anything, if a
+    rename can't be moved back because its original path has been taken since
+    '''
+    journal_path = Path(journal_path)
+    entries_list = drop_cancelled_entries(read_journal(journal_path))
+    undo_entries_list = [x for x in entries_list if run_id is None or x['run'] == run_id]
+    kept_entries_list = [x for x in entries_list if run_id is not None and x['run'] != run_id]
+
+    collisions_list = get_restore_collisions(undo_entries_list)
+    if collisions_list:
+        for collision in collisions_list:
+            print(f'COLLISION: {collision}')
+        raise FileExistsError(f'{len(collisions_list)} collisions restoring {journal_path.stem}, nothing was undone')
+
+    for entry_dict in reversed(undo_entries_list):
+        if entry_dict['operation'] == 'rename':
+            if entry_dict['path'] == entry_dict['target']:  # renamed onto itself
+                continue
+            if entry_dict['path'].casefold() == entry_dict['target'].casefold():
+                # case-only rename, through a temporary name as on the way forward
+                # since both names are the same directory on Windows and macOS
+                if os.path.lexists(entry_dict['target']):
+                    temporary_path = f"{entry_dict['target']}.restoring_{os.getpid()}"
+                    os.rename(entry_dict['target'], temporary_path)
+                    os.rename(temporary_path, entry_dict['path'])
+                continue
+            if not os.path.lexists(entry_dict['target']):
+                continue  # recorded ahead but never happened, or already moved back
+            if os.path.lexists(entry_dict['path']):
+                # something took the original name since, don't overwrite it
+                raise FileExistsError(f"Can't move {entry_dict['target']} back, {entry_dict['path']} exists")
+            os.rename(entry_dict['target'], entry_dict['path'])
+        elif entry_dict['operation'] == 'create':
+            try:
+                os.remove(entry_dict['path'])
+            except FileNotFoundError:
+                pass
+        elif entry_dict['operation'] == 'mkdir':
+            try:
+                os.rmdir(entry_dict['path'])
+            except FileNotFoundError:
+                pass
+            except OSError:  # not empty, something that wasn't journaled is in it
+                print(f"WARNING: {entry_dict['path']} is not empty, left in place")
+
+    # keep the runs that weren't undone
+    if kept_entries_list:
+        temporary_path = journal_path.with_name(f'{journal_path.name}.tmp')
+        with open(temporary_path, 'w') as journal_file:
+            for entry_dict in kept_entries_list:
+                journal_file.write(json.dumps(entry_dict) + '\n')
+        os.replace(temporary_path, journal_path)
+    else:
+        journal_path.unlink()
+        try:  # last journal in the directory
+            journal_path.parents[0].rmdir()
+        except OSError:
+            pass
+
+    print(f'Restored {journal_path.stem}: undid {len(undo_entries_list)} operations')
+
+    return len(undo_entries_list)
+
+
+def get_run_ids(root_directory):
+    '''
+    -- Purpose --
+    Get the run ids recorded in every volume journal in root_directory
+
+    -- Arguments --
+    root_directory: type=Path-like object; directory with the volumes
+
+    -- Returns --
+    run_ids_list: type=list; sorted run ids, oldest first
+    '''
+    run_ids_set = set()
+    for journal_path in Path(root_directory).joinpath(journal_directory_name).glob('*.jsonl'):
+        run_ids_set.update(x['run'] for x in read_journal(journal_path))
+    return sorted(run_ids_set)
+
+
+def rollback_run(root_directory, run_id=None):
+    '''
+    -- Purpose --
+    Restore every volume in root_directory that run_id changed, in reverse order of
+    when the run started on each
+
+    -- Arguments --
+    root_directory: type=Path-like object; directory with the volumes
+    run_id: type=string; run to roll back, None for the most recent run
+
+    -- Returns --
+    number_of_volumes: type=integer; number of volumes restored
+    '''
+    if run_id is None:
+        run_ids_list = get_run_ids(root_directory)
+        if not run_ids_list:
+            print(f'No runs to roll back in {root_directory}')
+            return 0
+        run_id = run_ids_list[-1]
+
+    print(f'Rolling back run {run_id} in {root_directory}')
+
+    # newest volume first, like the entries in a journal: a later volume can depend on
+    # an earlier one, e.g. moved into the "book" directory the first volume made
+    started_journal_paths_list = []
+    for journal_path in Path(root_directory).joinpath(journal_directory_name).glob('*.jsonl'):
+        run_times_list = [x.get('time', 0) for x in read_journal(journal_path) if x['run'] == run_id]
+        if run_times_list:
+            started_journal_paths_list.append((min(run_times_list), journal_path.name, journal_path))
+
+    number_of_volumes = 0
+    for _, _, journal_path in sorted(started_journal_paths_list, reverse=True):
+        restore_volume(journal_path, run_id)
+        number_of_volumes += 1
+
+    print(f' Rolled back {number_of_volumes} volumes')
+    print('')
+
+    return number_of_volumes
@@ -0,0 +1,163 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from string import Template
+from xml.sax.saxutils import escape
+
+# Islandora book batch ingest picks up MODS.xml in each book ingest directory
+mods_name = 'MODS.xml'
+
+# YAML rows are written by create_yaml as: key: "value"
+yaml_row_pattern = re.compile(r'^\s*([A-Za-z_]+)\s*:\s*"?(.*?)"?\s*$')
+
+# ===== Templates
+# compiled once at import, each record only substitutes escaped values
+
+mods_template = Template('''<?xml version="1.0" encoding="UTF-8"?>
+<mods xmlns="http://www.loc.gov/mods/v3" xmlns:xlink="http://www.w3.org/1999/xlink" version="3.5">
+$elements</mods>
+''')
+
+# YAML key (lower-case) -> (MODS parent element, element template)
+element_templates_dict = {
+    'adminDB': (None, Template('  <identifier type="local">$value</identifier>\n')),
+    'title': ('titleInfo', Template('    <title>$value</title>\n')),
+    'volume': ('part', Template('    <detail type="volume">\n      <number>$value</number>\n    </detail>\n')),
+    'number': ('part', Template('    <detail type="issue">\n      <number>$value</number>\n    </detail>\n')),
+    'season': ('part', Template('    <detail type="season">\n      <caption>$value</caption>\n    </detail>\n')),
+    'year': ('originInfo', Template('    <dateIssued>$value</dateIssued>\n')),
+    'date_issued': ('originInfo', Template('    <dateIssued>$value</dateIssued>\n')),
+    'date_issued_edtf': ('originInfo', Template('    <dateIssued encoding="edtf" keyDate="yes">$value</dateIssued>\n')),
+    'date_created_edtf': ('originInfo', Template('    <dateCreated encoding="edtf" keyDate="yes">$value</dateCreated>\n')),
+}
+element_templates_dict = {key.lower(): value for key, value in element_templates_dict.items()}
+
+# parent elements in MODS order
+parent_elements_list = [None, 'titleInfo', 'part', 'originInfo']
+
+
+def read_yaml_rows(yaml_path):
+    '''
+    -- Purpose --
+    Read the key: "value" rows of a publication YAML file
+
+    -- Arguments --
+    yaml_path: type=Path-like object; YAML file created by create_yaml
+
+    -- Returns --
+    yaml_dict: type=dictionary; value per lower-case key, e.g. date_Issued -> date_issued
+    '''
+    yaml_dict = {}
+    with open(yaml_path, encoding='utf-8') as yaml_file:
+        for line in yaml_file:
+            match = yaml_row_pattern.match(line)
+            if match:
+                yaml_dict[match.group(1).lower()] = match.group(2)
+    return yaml_dict
+
+
+def get_mods_xml(yaml_dict):
+    '''
+    -- Purpose --
+    Fill the MODS template with the values from a publication YAML file
+
+    -- Arguments --
+    yaml_dict: type=dictionary; see read_yaml_rows()
+
+    -- Returns --
+    mods_xml: type=string; MODS record, keys without a template are ignored
+    '''
+    elements_dict = {parent: [] for parent in parent_elements_list}
+    for key, value in yaml_dict.items():
+        try:
+            parent, element_template = element_templates_dict[key]
+        except KeyError:
+            continue
+        elements_dict[parent].append(element_template.substitute(value=escape(value)))
+
+    elements_list = []
+    for parent in parent_elements_list:
+        if not elements_dict[parent]:
+            continue
+        if parent is None:
+            elements_list.extend(elements_dict[parent])
+        else:
+            elements_list.append(f'  <{parent}>\n{"".join(elements_dict[parent])}  </{parent}>\n')
+
+    return mods_template.substitute(elements=''.join(elements_list))
+
+
+def create_mods(yaml_path, ingest_directory):
+    '''
+    -- Purpose --
+    Create MODS.xml in a book ingest directory from its publication YAML file
+
+    -- Arguments --
+    yaml_path: type=Path-like object; YAML file created by create_yaml
+    ingest_directory: type=Path-like object; book ingest directory
+
+    -- Returns --
+    mods_path: type=Path-like object; Path to MODS.xml
+    '''
+    mods_path = Path(ingest_directory).joinpath(mods_name)
+    mods_xml = get_mods_xml(read_yaml_rows(yaml_path))
+    with open(mods_path, 'w', encoding='utf-8') as mods_file:
+        mods_file.write(mods_xml)
+    return mods_path
+
+
+def get_ingest_directory_paths(yaml_paths_list, ingest_directory_names_list):
+    # the ingest directory has the YAML file's name, optionally with an ingest stub
+    # after it, e.g. <directory>_ForIslandoraIngest_Created_YYYY-MM-DD; each directory
+    # goes to the longest matching YAML stem so <directory>_2 isn't matched as <directory>
+    yaml_paths_dict = {yaml_path.stem: yaml_path for yaml_path in yaml_paths_list}
+    ingest_directory_paths_dict = {}
+    for name in ingest_directory_names_list:
+        name_parts_list = name.split('_')
+        for index in range(len(name_parts_list), 0, -1):
+            yaml_path = yaml_paths_dict.get('_'.join(name_parts_list[:index]))
+            if yaml_path is not None:
+                ingest_directory_paths_dict.setdefault(yaml_path, yaml_path.parents[0].joinpath(name))
+                break
+    return ingest_directory_paths_dict
+
+
+def create_mods_for_book_directory(book_directory, workers=None):
+    '''
+    -- Purpose --
+    Create MODS.xml in every ingest directory of an Islandora "book" directory from
+    the YAML files next to them
+
+    -- Arguments --
+    book_directory: type=Path-like object; "book" directory with <directory>.yml
+    files and their ingest directories
+    workers: type=integer; number of threads writing files, defaults to os.cpu_count()
+
+    -- Returns --
+    mods_paths_list: type=list; Path-like objects of the MODS.xml files created
+    '''
+    book_directory_path = Path(book_directory)
+    yaml_paths_list = sorted(book_directory_path.glob('*.yml'))
+    ingest_directory_names_list = sorted(entry.name for entry in os.scandir(book_directory_path) if entry.is_dir())
+    ingest_directory_paths_dict = get_ingest_directory_paths(yaml_paths_list, ingest_directory_names_list)
+
+    jobs_list = []
+    for yaml_path in yaml_paths_list:
+        if yaml_path not in ingest_directory_paths_dict:
+            print(f'WARNING: no ingest directory for {yaml_path.name}')
+            continue
+        jobs_list.append((yaml_path, ingest_directory_paths_dict[yaml_path]))
+
+    print(f'Creating {len(jobs_list)} MODS records in {book_directory_path}')
+
+    # writes to the share are latency-bound, so overlap them in threads
+    if workers is None:
+        workers = os.cpu_count()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        mods_paths_list = list(executor.map(lambda job: create_mods(*job), jobs_list))
+
+    print(f' Created {len(mods_paths_list)} MODS records')
+    print('')
+
+    return mods_paths_list
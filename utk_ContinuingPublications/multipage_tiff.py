@@ -0,0 +1,409 @@
+import mmap
+import re
+import struct
+from pathlib import Path
+
+from utk_ContinuingPublications.backup import chunk_size
+from utk_ContinuingPublications.io_scheduler import default_io_scheduler
+
+# a volume's pages are put into 1 multi-page TIFF by copying each page's tags and
+# compressed strips or tiles byte for byte, nothing is decoded or re-encoded, so 1
+# large sequential file can be copied to the share instead of thousands of pages
+
+# TIFF field type -> bytes per value
+tiff_type_sizes_dict = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8,
+                        13: 4, 16: 8, 17: 8, 18: 8}
+# integer TIFF field type -> struct format
+tiff_type_formats_dict = {1: 'B', 3: 'H', 4: 'I', 6: 'b', 8: 'h', 9: 'i', 13: 'I', 16: 'Q', 17: 'q', 18: 'Q'}
+# BigTIFF-only 64-bit types -> 32-bit type for classic TIFF
+classic_types_dict = {16: 4, 17: 9, 18: 13}
+
+compression_tag = 259
+page_name_tag = 285
+page_number_tag = 297
+# (offsets tag, byte counts tag) of the image data: strips or tiles
+image_data_tags_list = [(273, 279), (324, 325)]
+# tags that point somewhere else in the file, they can't be copied without parsing
+# what they point at, so they're left out
+dropped_tags_dict = {288: 'FreeOffsets', 289: 'FreeByteCounts', 330: 'SubIFDs',
+                     513: 'JPEGInterchangeFormat', 514: 'JPEGInterchangeFormatLength',
+                     34665: 'Exif IFD', 34853: 'GPS IFD', 40965: 'Interoperability IFD'}
+# old-style JPEG keeps its data behind JPEGInterchangeFormat
+old_jpeg_compression = 6
+
+# offsets in a classic TIFF are unsigned 32-bit, BigTIFF is used past this
+classic_tiff_max_bytes = 2 ** 32 - 1
+# room left for each page's tags when estimating the multi-page TIFF's size
+ifd_bytes_per_page = 64 * 1024
+
+page_extensions_list = ['.tif', '.tiff']
+# Islandora book ingest page directories: 1, 2, etc. or 000001, 000002, etc.
+page_directory_pattern = re.compile(r'^\d+$')
+
+
+def read_tiff_header(tiff_map):
+    '''
+    -- Purpose --
+    Read the byte order, version, and first IFD offset of a TIFF or BigTIFF
+
+    -- Arguments --
+    tiff_map: type=mmap or bytes-like object; the TIFF file
+
+    -- Returns --
+    (byte_order, bigtiff, ifd_offset): type=tuple; struct byte order '<' or '>',
+    True for BigTIFF, offset of the first IFD
+    '''
+    byte_order = {b'II': '<', b'MM': '>'}.get(bytes(tiff_map[:2]))
+    if byte_order is None:
+        raise ValueError('Not a TIFF file')
+    version = struct.unpack_from(f'{byte_order}H', tiff_map, 2)[0]
+    if version == 42:
+        return (byte_order, False, struct.unpack_from(f'{byte_order}I', tiff_map, 4)[0])
+    if version == 43:
+        return (byte_order, True, struct.unpack_from(f'{byte_order}Q', tiff_map, 8)[0])
+    raise ValueError(f'Unknown TIFF version {version}')
+
+
+def read_ifd(tiff_map, byte_order, bigtiff, ifd_offset):
+    '''
+    -- Purpose --
+    Read every entry of 1 IFD (1 page) with its raw value bytes
+
+    -- Arguments --
+    tiff_map: type=mmap or bytes-like object; the TIFF file
+    byte_order: type=string; '<' or '>'
+    bigtiff: type=boolean; True for BigTIFF
+    ifd_offset: type=integer; offset of the IFD
+
+    -- Returns --
+    (entries_dict, next_ifd_offset): type=tuple; tag -> (type, count, value bytes),
+    offset of the next IFD or 0 for the last page
+    '''
+    count_format, offset_format = ('Q', 'Q') if bigtiff else ('H', 'I')
+    entry_size, value_size = (20, 8) if bigtiff else (12, 4)
+
+    number_of_entries = struct.unpack_from(f'{byte_order}{count_format}', tiff_map, ifd_offset)[0]
+    position = ifd_offset + struct.calcsize(count_format)
+
+    entries_dict = {}
+    for _ in range(number_of_entries):
+        tag, tiff_type = struct.unpack_from(f'{byte_order}HH', tiff_map, position)
+        count = struct.unpack_from(f'{byte_order}{offset_format}', tiff_map, position + 4)[0]
+        value_position = position + 4 + value_size
+        position += entry_size
+        if tiff_type not in tiff_type_sizes_dict:  # readers skip unknown types
+            continue
+        size = tiff_type_sizes_dict[tiff_type] * count
+        if size > value_size:  # value is elsewhere in the file
+            value_position = struct.unpack_from(f'{byte_order}{offset_format}', tiff_map, value_position)[0]
+        entries_dict[tag] = (tiff_type, count, bytes(tiff_map[value_position:value_position + size]))
+
+    next_ifd_offset = struct.unpack_from(f'{byte_order}{offset_format}', tiff_map, position)[0]
+
+    return (entries_dict, next_ifd_offset)
+
+
+def get_values(byte_order, entry):
+    # integers of a (type, count, value bytes) entry
+    tiff_type, count, value_bytes = entry
+    return list(struct.unpack(f'{byte_order}{count}{tiff_type_formats_dict[tiff_type]}', value_bytes))
+
+
+def pack_values(byte_order, tiff_type, values_list):
+    # (type, count, value bytes) entry from integers
+    return (tiff_type, len(values_list),
+            struct.pack(f'{byte_order}{len(values_list)}{tiff_type_formats_dict[tiff_type]}', *values_list))
+
+
+def write_header(output_file, byte_order, bigtiff):
+    # header with a first IFD offset of 0, returns where to write the real offset
+    output_file.write(b'II' if byte_order == '<' else b'MM')
+    if bigtiff:
+        output_file.write(struct.pack(f'{byte_order}HHHQ', 43, 8, 0, 0))
+        return 8
+    output_file.write(struct.pack(f'{byte_order}HI', 42, 0))
+    return 4
+
+
+def align(output_file):
+    # TIFF offsets must be even
+    if output_file.tell() % 2:
+        output_file.write(b'\0')
+
+
+def copy_image_data(tiff_map, entries_dict, byte_order, bigtiff, output_file, transfer):
+    '''
+    -- Purpose --
+    Copy a page's compressed strips or tiles to the end of output_file, strips that
+    follow each other in the source are copied together
+
+    -- Arguments --
+    tiff_map: type=mmap; source TIFF
+    entries_dict: type=dictionary; the page's entries from read_ifd()
+    byte_order: type=string; '<' or '>'
+    bigtiff: type=boolean; True if output_file is a BigTIFF
+    output_file: type=file object; opened 'wb'
+    transfer: type=Transfer; from IOScheduler.transfer()
+
+    -- Returns --
+    data_entries_dict: type=dictionary; offsets and byte counts entries pointing at
+    the copies
+    '''
+    for offsets_tag, byte_counts_tag in image_data_tags_list:
+        if offsets_tag in entries_dict:
+            break
+    else:
+        raise ValueError('Page has no strips or tiles')
+
+    offsets_list = get_values(byte_order, entries_dict[offsets_tag])
+    byte_counts_list = get_values(byte_order, entries_dict[byte_counts_tag])
+
+    align(output_file)
+    new_offsets_list = []
+    with memoryview(tiff_map) as tiff_view:
+        run_start = run_end = None
+        for offset, byte_count in zip(offsets_list, byte_counts_list):
+            new_offsets_list.append(output_file.tell() + (run_end - run_start if run_start is not None else 0))
+            if run_start is not None and offset == run_end:
+                run_end += byte_count
+                continue
+            if run_start is not None:
+                write_view(output_file, tiff_view[run_start:run_end], transfer)
+            run_start, run_end = offset, offset + byte_count
+        if run_start is not None:
+            write_view(output_file, tiff_view[run_start:run_end], transfer)
+
+    offset_type = 16 if bigtiff else 4
+    return {offsets_tag: pack_values(byte_order, offset_type, new_offsets_list),
+            byte_counts_tag: pack_values(byte_order, offset_type, byte_counts_list)}
+
+
+def write_view(output_file, view, transfer):
+    # large writes, counted by the I/O scheduler
+    for start in range(0, len(view), chunk_size):
+        chunk = view[start:start + chunk_size]
+        transfer.add(len(chunk))
+        output_file.write(chunk)
+
+
+def write_ifd(output_file, byte_order, bigtiff, entries_dict):
+    '''
+    -- Purpose --
+    Write the values that don't fit in their entries, then the IFD, at the end of
+    output_file
+
+    -- Arguments --
+    output_file: type=file object; opened 'wb'
+    byte_order: type=string; '<' or '>'
+    bigtiff: type=boolean; True for BigTIFF
+    entries_dict: type=dictionary; tag -> (type, count, value bytes)
+
+    -- Returns --
+    (ifd_offset, next_ifd_position): type=tuple; where the IFD starts, and where to
+    write the offset of the next IFD
+    '''
+    count_format, offset_format = ('Q', 'Q') if bigtiff else ('H', 'I')
+    value_size = 8 if bigtiff else 4
+
+    entries_list = []
+    for tag in sorted(entries_dict):  # entries must be sorted by tag
+        tiff_type, count, value_bytes = entries_dict[tag]
+        if not bigtiff and tiff_type in classic_types_dict:
+            values_list = get_values(byte_order, entries_dict[tag])
+            if max(values_list, default=0) > classic_tiff_max_bytes:
+                raise ValueError(f'Tag {tag} needs BigTIFF')
+            tiff_type, count, value_bytes = pack_values(byte_order, classic_types_dict[tiff_type], values_list)
+        if len(value_bytes) > value_size:
+            align(output_file)
+            value_field = struct.pack(f'{byte_order}{offset_format}', output_file.tell())
+            output_file.write(value_bytes)
+        else:
+            value_field = value_bytes.ljust(value_size, b'\0')
+        entries_list.append(struct.pack(f'{byte_order}HH{offset_format}', tag, tiff_type, count) + value_field)
+
+    align(output_file)
+    ifd_offset = output_file.tell()
+    output_file.write(struct.pack(f'{byte_order}{count_format}', len(entries_list)))
+    output_file.write(b''.join(entries_list))
+    next_ifd_position = output_file.tell()
+    output_file.write(struct.pack(f'{byte_order}{offset_format}', 0))
+
+    return (ifd_offset, next_ifd_position)
+
+
+def link_ifd(output_file, byte_order, bigtiff, position, ifd_offset):
+    # point the header or the previous IFD at ifd_offset, then go back to the end
+    output_file.seek(position)
+    output_file.write(struct.pack(f"{byte_order}{'Q' if bigtiff else 'I'}", ifd_offset))
+    output_file.seek(0, 2)
+
+
+def assemble_multipage_tiff(image_paths_list, output_path, bigtiff=None):
+    '''
+    -- Purpose --
+    Put single-page TIFFs into 1 multi-page TIFF in page order by copying their tags
+    and compressed strips or tiles, nothing is decoded. Each page keeps its file name
+    in the PageName tag so split_multipage_tiff() can put the pages back.
+    Only the first image of each TIFF is copied, tags that point elsewhere in the
+    file (Exif, GPS, SubIFDs) are left out.
+
+    -- Arguments --
+    image_paths_list: type=list; Path-like objects of the pages in page order, all
+    with the same byte order
+    output_path: type=Path-like object; multi-page TIFF to create
+    bigtiff: type=boolean; None to use BigTIFF only if the pages need more than 4 GB
+
+    -- Returns --
+    output_path: type=Path-like object; the multi-page TIFF
+    '''
+    output_path = Path(output_path)
+    number_of_pages = len(image_paths_list)
+    if bigtiff is None:
+        estimated_bytes = sum(Path(x).stat().st_size + ifd_bytes_per_page for x in image_paths_list)
+        bigtiff = estimated_bytes > classic_tiff_max_bytes
+
+    print(f"Assembling {number_of_pages} pages into {'BigTIFF' if bigtiff else 'TIFF'} {output_path}")
+
+    dropped_tag_names_set = set()
+    byte_order = None
+    with open(output_path, 'wb') as output_file:
+        for page_index, image_path in enumerate(image_paths_list):
+            image_path = Path(image_path)
+            with open(image_path, 'rb') as image_file, \
+                    mmap.mmap(image_file.fileno(), 0, access=mmap.ACCESS_READ) as tiff_map, \
+                    default_io_scheduler.transfer(image_path, output_path) as transfer:
+                page_byte_order, page_bigtiff, ifd_offset = read_tiff_header(tiff_map)
+                if byte_order is None:
+                    byte_order = page_byte_order
+                    next_ifd_position = write_header(output_file, byte_order, bigtiff)
+                elif page_byte_order != byte_order:
+                    # uncompressed 16-bit pixels are stored in the file's byte order
+                    raise ValueError(f'{image_path.name} has a different byte order than the pages before it')
+
+                entries_dict, next_page_offset = read_ifd(tiff_map, byte_order, page_bigtiff, ifd_offset)
+                if next_page_offset:
+                    print(f'WARNING: {image_path.name} has more than 1 image, only the first is copied')
+                if compression_tag in entries_dict and \
+                        get_values(byte_order, entries_dict[compression_tag])[0] == old_jpeg_compression:
+                    raise ValueError(f"{image_path.name} uses old-style JPEG compression, which can't be copied")
+
+                for tag in [x for x in entries_dict if x in dropped_tags_dict]:
+                    dropped_tag_names_set.add(dropped_tags_dict[tag])
+                    del entries_dict[tag]
+
+                entries_dict.update(copy_image_data(tiff_map, entries_dict, byte_order, bigtiff, output_file,
+                                                    transfer))
+
+            # TIFF ASCII is 7-bit, but page names are written as UTF-8 so any name comes back
+            page_name_bytes = image_path.name.encode('utf-8') + b'\0'
+            entries_dict[page_name_tag] = (2, len(page_name_bytes), page_name_bytes)
+            entries_dict[page_number_tag] = pack_values(byte_order, 3, [page_index, number_of_pages])
+
+            ifd_offset, new_next_ifd_position = write_ifd(output_file, byte_order, bigtiff, entries_dict)
+            link_ifd(output_file, byte_order, bigtiff, next_ifd_position, ifd_offset)
+            next_ifd_position = new_next_ifd_position
+
+        if not bigtiff and output_file.tell() > classic_tiff_max_bytes:
+            raise ValueError(f'{output_path.name} is over 4 GB, use bigtiff=True')
+
+    if dropped_tag_names_set:
+        print(f"WARNING: left out tags that can't be copied: {', '.join(sorted(dropped_tag_names_set))}")
+    print(f'{number_of_pages} pages, {output_path.stat().st_size / 1024 ** 3:.2f} GB in {output_path}')
+    print('')
+
+    return output_path
+
+
+def split_multipage_tiff(multipage_path, output_directory, page_directories=False):
+    '''
+    -- Purpose --
+    Copy every page of a multi-page TIFF back into its own TIFF, named from the
+    PageName tag written by assemble_multipage_tiff(), again without decoding
+
+    -- Arguments --
+    multipage_path: type=Path-like object; multi-page TIFF
+    output_directory: type=Path-like object; directory for the pages, created if needed
+    page_directories: type=boolean; put each page in 000001/, 000002/, etc. like the
+    move_pages ingest layout
+
+    -- Returns --
+    page_paths_list: type=list; Path-like objects of the pages in page order
+    '''
+    multipage_path = Path(multipage_path)
+    output_directory_path = Path(output_directory)
+    output_directory_path.mkdir(parents=True, exist_ok=True)
+
+    print(f'Splitting {multipage_path.name} into {output_directory_path}')
+
+    page_paths_list = []
+    with open(multipage_path, 'rb') as multipage_file, \
+            mmap.mmap(multipage_file.fileno(), 0, access=mmap.ACCESS_READ) as tiff_map:
+        byte_order, bigtiff, ifd_offset = read_tiff_header(tiff_map)
+
+        while ifd_offset:
+            entries_dict, ifd_offset = read_ifd(tiff_map, byte_order, bigtiff, ifd_offset)
+            page_number = len(page_paths_list) + 1
+
+            page_name_entry = entries_dict.pop(page_name_tag, None)
+            entries_dict.pop(page_number_tag, None)
+            if page_name_entry is not None:
+                page_name = Path(page_name_entry[2].rstrip(b'\0').decode('utf-8')).name
+            else:
+                page_name = f'{multipage_path.stem}_{str(page_number).zfill(4)}{multipage_path.suffix}'
+
+            page_directory_path = output_directory_path
+            if page_directories:
+                page_directory_path = output_directory_path.joinpath(str(page_number).zfill(6))
+                page_directory_path.mkdir(exist_ok=True)
+            page_path = page_directory_path.joinpath(page_name)
+
+            # pages come out as classic TIFFs unless 1 page is over 4 GB
+            for offsets_tag, byte_counts_tag in image_data_tags_list:
+                if byte_counts_tag in entries_dict:
+                    page_bigtiff = sum(get_values(byte_order, entries_dict[byte_counts_tag])) + \
+                        ifd_bytes_per_page > classic_tiff_max_bytes
+                    break
+            else:
+                raise ValueError(f'Page {page_number} of {multipage_path.name} has no strips or tiles')
+
+            with open(page_path, 'wb') as page_file, \
+                    default_io_scheduler.transfer(multipage_path, page_path) as transfer:
+                header_ifd_position = write_header(page_file, byte_order, page_bigtiff)
+                entries_dict.update(copy_image_data(tiff_map, entries_dict, byte_order, page_bigtiff, page_file,
+                                                    transfer))
+                page_ifd_offset = write_ifd(page_file, byte_order, page_bigtiff, entries_dict)[0]
+                link_ifd(page_file, byte_order, page_bigtiff, header_ifd_position, page_ifd_offset)
+
+            page_paths_list.append(page_path)
+
+    print(f'{len(page_paths_list)} pages split into {output_directory_path}')
+    print('')
+
+    return page_paths_list
+
+
+def get_ingest_page_paths(ingest_directory_path):
+    '''
+    -- Purpose --
+    Get the page TIFFs of an Islandora book ingest directory in page order, i.e. the
+    TIFF in 1/, 2/, etc. or 000001/, 000002/, etc.
+
+    -- Arguments --
+    ingest_directory_path: type=Path-like object; from create_islandora_ingest_directory()
+
+    -- Returns --
+    image_paths_list: type=list; Path-like objects, 1 per page directory
+    '''
+    page_directory_paths_list = sorted((x for x in Path(ingest_directory_path).iterdir()
+                                        if x.is_dir() and page_directory_pattern.match(x.name)),
+                                       key=lambda x: int(x.name))
+
+    image_paths_list = []
+    for page_directory_path in page_directory_paths_list:
+        page_image_paths_list = [x for x in page_directory_path.iterdir()
+                                 if x.suffix.lower() in page_extensions_list and not x.name.startswith('.')]
+        if len(page_image_paths_list) != 1:
+            raise ValueError(f'Expected 1 TIFF in {page_directory_path}, found {len(page_image_paths_list)}')
+        image_paths_list.extend(page_image_paths_list)
+
+    return image_paths_list
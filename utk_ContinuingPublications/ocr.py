@@ -0,0 +1,152 @@
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from utk_ContinuingPublications.common import get_file_hash
+
+# Islandora book page datastream file names
+ocr_name = 'OCR.txt'
+hocr_name = 'HOCR.html'
+
+# OCR results are cached by page content so renaming a volume or its pages
+# doesn't mean running Tesseract again
+default_cache_directory_path = Path.home().joinpath('.cache', 'utk_ContinuingPublications', 'ocr')
+
+
+def run_tesseract(image_path, output_directory_path, language='eng'):
+    '''
+    -- Purpose --
+    Run Tesseract once on image_path to create both OCR.txt and HOCR.html
+
+    -- Arguments --
+    image_path: type=Path-like object; page image
+    output_directory_path: type=Path-like object; directory to write OCR.txt and HOCR.html
+    language: type=string; Tesseract language(s), e.g. 'eng' or 'eng+fra'
+
+    -- Returns --
+    None
+    '''
+    # pages already run in parallel, so keep each Tesseract to 1 thread
+    environment = dict(os.environ, OMP_THREAD_LIMIT='1')
+
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        output_base = Path(temporary_directory).joinpath('page')
+        subprocess.run(['tesseract', str(image_path), str(output_base), '-l', language, 'txt', 'hocr'],
+                       check=True,
+                       stdout=subprocess.DEVNULL,
+                       stderr=subprocess.PIPE,
+                       env=environment)
+        shutil.move(str(output_base.with_suffix('.txt')), str(Path(output_directory_path).joinpath(ocr_name)))
+        shutil.move(str(output_base.with_suffix('.hocr')), str(Path(output_directory_path).joinpath(hocr_name)))
+
+
+def ocr_page(image_path, cache_directory_path=default_cache_directory_path, language='eng', overwrite=False):
+    '''
+    -- Purpose --
+    Write OCR.txt and HOCR.html next to a page image, re-using cached results for
+    an image with the same contents
+
+    -- Arguments --
+    image_path: type=Path-like object; page TIFF in an ingest sub-directory
+    cache_directory_path: type=Path-like object; OCR cache, None to disable the cache
+    language: type=string; Tesseract language(s)
+    overwrite: type=boolean; re-create OCR.txt and HOCR.html if they already exist
+
+    -- Returns --
+    from_cache: type=boolean; True if the results came from the cache, None if skipped
+    '''
+    image_path = Path(image_path)
+    page_directory_path = image_path.parents[0]
+    ocr_path = page_directory_path.joinpath(ocr_name)
+    hocr_path = page_directory_path.joinpath(hocr_name)
+
+    if not overwrite and ocr_path.exists() and hocr_path.exists():
+        return None
+
+    if cache_directory_path is None:
+        run_tesseract(image_path, page_directory_path, language)
+        return False
+
+    # cache key covers the page contents and the OCR settings
+    image_hash = get_file_hash(image_path)
+    cache_entry_path = Path(cache_directory_path).joinpath(language, image_hash[:2], image_hash)
+
+    from_cache = cache_entry_path.joinpath(hocr_name).is_file()
+    if not from_cache:
+        # OCR into a temporary entry and rename it so a half-written entry is never used
+        cache_entry_path.parents[0].mkdir(parents=True, exist_ok=True)
+        temporary_entry_path = Path(tempfile.mkdtemp(dir=cache_entry_path.parents[0]))
+        run_tesseract(image_path, temporary_entry_path, language)
+        try:
+            temporary_entry_path.rename(cache_entry_path)
+        except OSError:  # another worker cached the same page first
+            shutil.rmtree(temporary_entry_path)
+
+    shutil.copyfile(cache_entry_path.joinpath(ocr_name), ocr_path)
+    shutil.copyfile(cache_entry_path.joinpath(hocr_name), hocr_path)
+
+    return from_cache
+
+
+def ocr_ingest_directory(ingest_directory, workers=None, cache_directory_path=default_cache_directory_path,
+                         language='eng', overwrite=False, journal=None):
+    '''
+    -- Purpose --
+    OCR every page of an Islandora ingest directory, running pages across all cores
+
+    -- Arguments --
+    ingest_directory: type=Path-like object; directory created by
+    create_islandora_ingest_directory with 1 NNNNNN/ sub-directory per page
+    workers: type=integer; number of Tesseract processes at once, defaults to os.cpu_count()
+    cache_directory_path: type=Path-like object; OCR cache, None to disable the cache
+    language: type=string; Tesseract language(s)
+    overwrite: type=boolean; re-create OCR.txt and HOCR.html if they already exist
+    journal: type=VolumeJournal; records every OCR.txt and HOCR.html created, so the
+    volume's restore() removes them
+
+    -- Returns --
+    failed_image_paths_list: type=list; Path-like objects of pages that failed
+    '''
+    if shutil.which('tesseract') is None:
+        raise RuntimeError('Tesseract is not installed or not on the PATH')
+
+    ingest_directory_path = Path(ingest_directory)
+    image_paths_list = sorted(ingest_directory_path.glob('*/*.tif'))
+    number_of_images = len(image_paths_list)
+
+    if workers is None:
+        workers = os.cpu_count()
+
+    print(f'OCRing {number_of_images} pages in {ingest_directory_path.name} with {workers} workers')
+
+    # Tesseract runs in its own process, so threads are enough to use every core
+    failed_image_paths_list = []
+    number_from_cache = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # OCR files that don't exist yet, i.e. the ones this run creates
+        new_ocr_paths_lists = [[x.parents[0].joinpath(name) for name in (ocr_name, hocr_name)
+                                if not x.parents[0].joinpath(name).exists()]
+                               for x in image_paths_list]
+        futures_list = [executor.submit(ocr_page, image_path, cache_directory_path, language, overwrite)
+                        for image_path in image_paths_list]
+        for image_path, future, new_ocr_paths_list in zip(image_paths_list, futures_list, new_ocr_paths_lists):
+            try:
+                if future.result():
+                    number_from_cache += 1
+            except (OSError, subprocess.CalledProcessError) as error:
+                print(f'WARNING: OCR failed for {image_path}: {error!r}')
+                failed_image_paths_list.append(image_path)
+            if journal is not None:
+                for ocr_path in new_ocr_paths_list:
+                    if ocr_path.exists():
+                        journal.created(ocr_path)
+    if journal is not None:
+        journal.flush()
+
+    print(f' OCRed {number_of_images - len(failed_image_paths_list)} pages ({number_from_cache} from cache)')
+    print('')
+
+    return failed_image_paths_list
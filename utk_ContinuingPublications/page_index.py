@@ -0,0 +1,129 @@
+import re
+from functools import lru_cache
+from pathlib import Path
+
+# runs of digits, e.g. ['page_', '10', '.tif']
+digits_pattern = re.compile(r'(\d+)')
+# names kept per cache, enough for the biggest volumes without growing forever in
+# long-running processes like the watcher
+name_cache_size = 4096
+
+
+@lru_cache(maxsize=name_cache_size)
+def natural_sort_key(name):
+    '''
+    -- Purpose --
+    Sort key that orders numbers by value, so page_2.tif comes before page_10.tif
+    Keys are cached by name, a volume's names are parsed once however often it's sorted
+
+    -- Arguments --
+    name: type=string; file name
+
+    -- Returns --
+    key: type=tuple; (0, number) for digits and (1, text) for everything else
+    '''
+    key_list = []
+    for index, chunk in enumerate(digits_pattern.split(name)):
+        if index % 2:  # odd chunks are the digits
+            key_list.append((0, int(chunk), len(chunk)))
+        elif chunk:
+            key_list.append((1, chunk.lower(), 0))
+    return tuple(key_list)
+
+
+@lru_cache(maxsize=name_cache_size)
+def get_page_number(name):
+    '''
+    -- Purpose --
+    Get the page number from a file name, i.e. the last number in its stem,
+    e.g. TORCHBEARER_V53-N2_2018-FALL_0012.tif -> 12
+
+    -- Arguments --
+    name: type=string; file name
+
+    -- Returns --
+    page_number: type=integer; None if the stem has no digits
+    '''
+    numbers_list = digits_pattern.findall(Path(name).stem)
+    if not numbers_list:
+        return None
+    return int(numbers_list[-1])
+
+
+def sort_pages(file_paths_list):
+    '''
+    -- Purpose --
+    Sort file Paths in page order
+
+    -- Arguments --
+    file_paths_list: type=list; Path-like objects
+
+    -- Returns --
+    file_paths_list: type=list; new list of the Path-like objects in natural sort order
+    '''
+    return sorted(file_paths_list, key=lambda x: natural_sort_key(Path(x).name))
+
+
+def get_page_index(file_paths_list):
+    '''
+    -- Purpose --
+    Put a volume's pages in order and check the page numbers in their names for
+    gaps and duplicates, e.g. page_1.tif and page_01.tif, before anything is renamed
+
+    -- Arguments --
+    file_paths_list: type=list; Path-like objects of the pages
+
+    -- Returns --
+    page_index_dict: type=dictionary;
+    paths_list: the Path-like objects in page order
+    gaps_list: missing page numbers from page 1 (or 0, if there's a page 0) to the last page
+    duplicates_dict: page number -> names of the pages that share it
+    unnumbered_list: names with no page number
+    '''
+    paths_list = sort_pages(file_paths_list)
+
+    # page number -> names
+    page_names_dict = {}
+    unnumbered_list = []
+    for file_path in paths_list:
+        page_number = get_page_number(Path(file_path).name)
+        if page_number is None:
+            unnumbered_list.append(Path(file_path).name)
+        else:
+            page_names_dict.setdefault(page_number, []).append(Path(file_path).name)
+
+    gaps_list = []
+    if page_names_dict:
+        # a missing first page is a gap too, some scanners start at page 0
+        first_page_number = min(1, min(page_names_dict))
+        gaps_list = [x for x in range(first_page_number, max(page_names_dict)) if x not in page_names_dict]
+
+    duplicates_dict = {page_number: names_list for page_number, names_list in page_names_dict.items()
+                       if len(names_list) > 1}
+
+    return {'paths_list': paths_list,
+            'gaps_list': gaps_list,
+            'duplicates_dict': duplicates_dict,
+            'unnumbered_list': unnumbered_list}
+
+
+def get_page_index_problems(page_index_dict):
+    '''
+    -- Purpose --
+    Describe the gaps and duplicates in a page index
+
+    -- Arguments --
+    page_index_dict: type=dictionary; from get_page_index()
+
+    -- Returns --
+    problems_list: type=list; 1 string per problem, empty if the pages are in sequence
+    '''
+    problems_list = []
+    if page_index_dict['gaps_list']:
+        problems_list.append(f"missing pages {page_index_dict['gaps_list']}")
+    for page_number, names_list in sorted(page_index_dict['duplicates_dict'].items()):
+        problems_list.append(f'page {page_number} is in {names_list}')
+    # a mix of numbered and unnumbered pages can't be put in order
+    if page_index_dict['unnumbered_list'] and len(page_index_dict['unnumbered_list']) < len(page_index_dict['paths_list']):
+        problems_list.append(f"no page number in {page_index_dict['unnumbered_list']}")
+    return problems_list
@@ -0,0 +1,122 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+from utk_ContinuingPublications.split_pdfs import get_pdf_backend
+
+# PDF stem endings -> Islandora book ingest names, checked in order
+pdf_ingest_names_list = [('original', 'ORIGINAL.pdf'),
+                         ('edited', 'ORIGINAL_EDITED.pdf'),
+                         ('processed', 'PROCESSED.pdf')]
+
+# a volume usually has 1-3 PDFs, which open faster here than a process pool starts,
+# so only use a pool (PyMuPDF isn't thread-safe) for more PDFs than this
+pdf_process_pool_minimum = 8
+
+
+def get_pdf_ingest_name(pdf_path):
+    '''
+    -- Purpose --
+    Get the ingest name for a PDF from the end of its stem
+
+    -- Arguments --
+    pdf_path: type=Path-like object; PDF to name
+
+    -- Returns --
+    ingest_name: type=string; ORIGINAL.pdf, ORIGINAL_EDITED.pdf, or PROCESSED.pdf,
+    None if the stem doesn't end in original, edited, or processed
+    '''
+    stem = Path(pdf_path).stem.lower()
+    for ending, ingest_name in pdf_ingest_names_list:
+        if stem.endswith(ending):
+            return ingest_name
+    return None
+
+
+def inspect_pdf(pdf_path, backend=None):
+    '''
+    -- Purpose --
+    Open a PDF once and record what the ingest checks need
+
+    -- Arguments --
+    pdf_path: type=Path-like object; PDF to inspect
+    backend: type=string; see split_pdfs.get_pdf_backend()
+
+    -- Returns --
+    pdf_info_dict: type=dictionary; path, size_bytes, number_of_pages (None if the
+    PDF can't be read), encrypted, and error (None if the PDF opened)
+    '''
+    pdf_path = Path(pdf_path)
+    pdf_info_dict = {'path': pdf_path,
+                     'size_bytes': pdf_path.stat().st_size,
+                     'number_of_pages': None,
+                     'encrypted': None,
+                     'error': None}
+
+    try:
+        with get_pdf_backend(backend)(pdf_path) as document:
+            pdf_info_dict['encrypted'] = document.encrypted
+            pdf_info_dict['number_of_pages'] = document.number_of_pages
+    except Exception as error:  # damaged, truncated, or password-protected
+        pdf_info_dict['error'] = f'{type(error).__name__}: {error}'
+
+    return pdf_info_dict
+
+
+def check_volume_pdfs(pdf_paths_list, number_of_tiffs, workers=None, backend=None):
+    '''
+    -- Purpose --
+    Inspect a volume's PDFs, pick each one's ingest name, and flag anything that
+    would fail after an ingest build: unreadable or encrypted PDFs, empty files,
+    page counts that don't match the TIFFs, and 2 PDFs with the same ingest name
+
+    -- Arguments --
+    pdf_paths_list: type=list; Path-like objects of the volume's PDFs
+    number_of_tiffs: type=integer; number of page TIFFs in the volume, None to skip
+    the page count check
+    workers: type=integer; number of PDFs opened at once when there are more than
+    pdf_process_pool_minimum, defaults to os.cpu_count()
+    backend: type=string; see split_pdfs.get_pdf_backend()
+
+    -- Returns --
+    pdf_info_dicts_list: type=list; 1 dictionary per PDF from inspect_pdf() with
+    ingest_name (None to leave the PDF alone) and problems_list (empty if the PDF
+    is OK to rename)
+    '''
+    if workers is None:
+        workers = os.cpu_count()
+
+    if not pdf_paths_list:
+        return []
+
+    if len(pdf_paths_list) <= pdf_process_pool_minimum or workers == 1:
+        pdf_info_dicts_list = [inspect_pdf(x, backend) for x in pdf_paths_list]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pdf_paths_list))) as executor:
+            pdf_info_dicts_list = list(executor.map(partial(inspect_pdf, backend=backend), pdf_paths_list))
+
+    # ingest name -> number of PDFs that would get it
+    ingest_name_counts_dict = {}
+    for pdf_info_dict in pdf_info_dicts_list:
+        pdf_info_dict['ingest_name'] = get_pdf_ingest_name(pdf_info_dict['path'])
+        if pdf_info_dict['ingest_name'] is not None:
+            ingest_name = pdf_info_dict['ingest_name']
+            ingest_name_counts_dict[ingest_name] = ingest_name_counts_dict.get(ingest_name, 0) + 1
+
+    for pdf_info_dict in pdf_info_dicts_list:
+        problems_list = []
+        if pdf_info_dict['size_bytes'] == 0:
+            problems_list.append('empty file')
+        if pdf_info_dict['error'] is not None:
+            problems_list.append(f"can't be read ({pdf_info_dict['error']})")
+        if pdf_info_dict['encrypted']:
+            problems_list.append('encrypted')
+        if None not in (number_of_tiffs, pdf_info_dict['number_of_pages']) and \
+                pdf_info_dict['number_of_pages'] != number_of_tiffs:
+            problems_list.append(f"{pdf_info_dict['number_of_pages']} pages but {number_of_tiffs} TIFFs")
+        if ingest_name_counts_dict.get(pdf_info_dict['ingest_name'], 0) > 1:
+            problems_list.append(f"more than 1 PDF would be renamed {pdf_info_dict['ingest_name']}")
+        pdf_info_dict['problems_list'] = problems_list
+
+    return pdf_info_dicts_list
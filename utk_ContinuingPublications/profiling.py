@@ -0,0 +1,267 @@
+import cProfile
+import csv
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:  # CPU time of finished child processes, not available on Windows
+    import resource
+except ImportError:
+    resource = None
+
+from utk_ContinuingPublications.journal import current_run_id
+
+# 1 bundle per run: <profiles directory>/<run id>/
+default_profiles_directory_path = Path.home().joinpath('.cache', 'utk_ContinuingPublications', 'profiles')
+
+stage_columns_list = ['volume', 'stage', 'wall_seconds', 'cpu_seconds', 'children_cpu_seconds', 'wait_seconds']
+
+# call stacks below this many seconds are left out of stages.folded, they can't be
+# seen in a flamegraph and following them can take longer than the run
+folded_min_seconds = 0.0005
+folded_max_depth = 200
+
+
+def get_children_cpu_seconds():
+    # user + system time of child processes that have been waited for, e.g.
+    # Tesseract, ImageMagick, and process pool workers
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def get_profile_name(name):
+    # volume and stage names become file names
+    return ''.join(x if x.isalnum() or x in '-_.' else '_' for x in name)
+
+
+def get_folded_name(name):
+    # ; separates frames in a folded stack
+    return str(name).replace(';', '_')
+
+
+def get_function_label(function):
+    # pstats function key is (file, line number, function name), '~' for built-ins
+    file_name, line_number, function_name = function
+    if file_name == '~':
+        return get_folded_name(function_name)
+    return get_folded_name(f'{function_name} ({Path(file_name).name}:{line_number})')
+
+
+def get_folded_stacks(stats_dict, stack_prefix):
+    '''
+    -- Purpose --
+    Rebuild the call stacks of 1 cProfile profile as folded stacks, e.g.
+    volume;stage;main (a.py:1);read (b.py:5) 1200
+
+    cProfile only keeps the time of each caller -> callee pair, not whole stacks,
+    so a function called from several places has its callees split between them in
+    proportion to the time each caller spent in it, the same as flameprof does.
+
+    -- Arguments --
+    stats_dict: type=dictionary; pstats.Stats(...).stats
+    stack_prefix: type=string; frames above the profiled code, e.g. volume;stage
+
+    -- Returns --
+    folded_stacks_dict: type=dictionary; self seconds per folded stack
+    '''
+    callees_dict = {}
+    root_functions_list = []
+    for function, (_, _, _, _, callers_dict) in stats_dict.items():
+        # called by the code that started the profile, maybe recursive
+        if not set(callers_dict) - {function}:
+            root_functions_list.append(function)
+        for caller, caller_stats in callers_dict.items():
+            # caller_stats[3] is the cumulative time of function called from caller
+            callees_dict.setdefault(caller, {})[function] = caller_stats[3]
+
+    folded_stacks_dict = {}
+
+    def add_stack(function, stack, seconds, functions_in_stack_set):
+        cumulative_seconds = stats_dict[function][3]
+        if seconds < folded_min_seconds or cumulative_seconds <= 0:
+            return
+        share = min(seconds / cumulative_seconds, 1.0)
+        stack = f'{stack};{get_function_label(function)}'
+        folded_stacks_dict[stack] = folded_stacks_dict.get(stack, 0.0) + stats_dict[function][2] * share
+        if len(functions_in_stack_set) >= folded_max_depth:
+            return
+        functions_in_stack_set.add(function)
+        for callee, callee_seconds in callees_dict.get(function, {}).items():
+            if callee not in functions_in_stack_set:  # recursion is already counted
+                add_stack(callee, stack, callee_seconds * share, functions_in_stack_set)
+        functions_in_stack_set.remove(function)
+
+    for function in root_functions_list:
+        add_stack(function, stack_prefix, stats_dict[function][3], set())
+
+    return folded_stacks_dict
+
+
+class RunProfiler:
+    '''
+    Opt-in profiling for a batch run, off until start() is called
+
+    Each stage of each volume runs under its own cProfile.Profile, so the time can
+    be read per stage and volume, and the clock is split into:
+    cpu_seconds: CPU time of this process, every thread
+    children_cpu_seconds: CPU time of child processes that finished during the stage
+    wait_seconds: wall time not covered by either, i.e. mostly waiting on I/O
+
+    finish() writes the bundle:
+    stages.csv: 1 row per volume and stage with the times above
+    stages.folded: volume;stage;<call stack> microseconds, for flamegraph.pl or
+    speedscope, see get_folded_stacks(). A stage's wall time that the profile
+    doesn't cover, e.g. a stage that was only timed, is left on volume;stage.
+    run.pstats: every stage's profile added together
+    <volume>/<stage>.pstats: 1 profile per stage, e.g. for snakeviz
+
+    cProfile only sees the thread that calls stage(), so work done in thread or
+    process pools shows up as cpu_seconds or children_cpu_seconds, not as functions.
+    Only 1 profile can run at a time, so when stages overlap, e.g. volumes processed
+    by the watcher's threads, the later stage is only timed, and its CPU times
+    include the other stages running with it.
+    '''
+
+    def __init__(self):
+        self.output_directory_path = None
+        self.stage_rows_list = []
+        self.profile_paths_list = []
+        self.profile_lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.output_directory_path is not None
+
+    def start(self, output_directory=None):
+        '''
+        -- Purpose --
+        Turn profiling on for the rest of the run
+
+        -- Arguments --
+        output_directory: type=Path-like object; bundle directory, defaults to
+        <default_profiles_directory_path>/<current_run_id>
+
+        -- Returns --
+        output_directory_path: type=Path-like object; where finish() writes the bundle
+        '''
+        if output_directory is None:
+            output_directory = default_profiles_directory_path.joinpath(current_run_id)
+        self.output_directory_path = Path(output_directory)
+        self.output_directory_path.mkdir(parents=True, exist_ok=True)
+        print(f'Profiling run {current_run_id} to {self.output_directory_path}')
+        return self.output_directory_path
+
+    @contextmanager
+    def stage(self, volume_name, stage_name):
+        '''
+        -- Purpose --
+        Profile and time the code in the with block as 1 stage of 1 volume, does
+        nothing unless start() was called
+
+        -- Arguments --
+        volume_name: type=string; e.g. the volume directory name
+        stage_name: type=string; e.g. 'rename'
+
+        -- Returns --
+        None
+        '''
+        if not self.enabled:
+            yield
+            return
+
+        # None if another stage is being profiled
+        profile = cProfile.Profile() if self.profile_lock.acquire(blocking=False) else None
+        wall_started = time.perf_counter()
+        cpu_started = time.process_time()
+        children_cpu_started = get_children_cpu_seconds()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+                self.profile_lock.release()
+            wall_seconds = time.perf_counter() - wall_started
+            cpu_seconds = time.process_time() - cpu_started
+            children_cpu_seconds = get_children_cpu_seconds() - children_cpu_started
+
+            # pools can use more CPU than wall time, then nothing was waited on
+            wait_seconds = max(wall_seconds - cpu_seconds - children_cpu_seconds, 0.0)
+            stage_row_dict = {'volume': volume_name,
+                              'stage': stage_name,
+                              'wall_seconds': round(wall_seconds, 3),
+                              'cpu_seconds': round(cpu_seconds, 3),
+                              'children_cpu_seconds': round(children_cpu_seconds, 3),
+                              'wait_seconds': round(wait_seconds, 3),
+                              'profile_path': None}
+
+            # written right away so a run that crashes still has its profiles
+            if profile is not None:
+                profile_path = self.output_directory_path.joinpath(get_profile_name(volume_name),
+                                                                   f'{get_profile_name(stage_name)}.pstats')
+                profile_path.parents[0].mkdir(exist_ok=True)
+                profile.dump_stats(str(profile_path))
+                self.profile_paths_list.append(profile_path)
+                stage_row_dict['profile_path'] = profile_path
+            self.stage_rows_list.append(stage_row_dict)
+
+    def finish(self):
+        '''
+        -- Purpose --
+        Write stages.csv, stages.folded, and run.pstats, and print the time per stage
+
+        -- Arguments --
+        None
+
+        -- Returns --
+        output_directory_path: type=Path-like object; the bundle, None if not profiling
+        '''
+        if not self.enabled:
+            return None
+
+        with open(self.output_directory_path.joinpath('stages.csv'), 'w', newline='', encoding='utf-8') as csv_file:
+            csv_writer = csv.DictWriter(csv_file, fieldnames=stage_columns_list, extrasaction='ignore')
+            csv_writer.writeheader()
+            csv_writer.writerows(self.stage_rows_list)
+
+        with open(self.output_directory_path.joinpath('stages.folded'), 'w', encoding='utf-8') as folded_file:
+            for row in self.stage_rows_list:
+                stage_stack = f"{get_folded_name(row['volume'])};{get_folded_name(row['stage'])}"
+                folded_stacks_dict = {}
+                if row['profile_path'] is not None:
+                    stats_dict = pstats.Stats(str(row['profile_path'])).stats
+                    folded_stacks_dict = get_folded_stacks(stats_dict, stage_stack)
+                folded_stacks_dict[stage_stack] = max(row['wall_seconds'] - sum(folded_stacks_dict.values()), 0.0)
+                for stack, seconds in folded_stacks_dict.items():
+                    microseconds = round(seconds * 1000000)
+                    if microseconds > 0:
+                        folded_file.write(f'{stack} {microseconds}\n')
+
+        if self.profile_paths_list:
+            run_stats = pstats.Stats(*[str(x) for x in self.profile_paths_list])
+            run_stats.dump_stats(str(self.output_directory_path.joinpath('run.pstats')))
+
+        # totals per stage across volumes
+        stage_totals_dict = {}
+        for row in self.stage_rows_list:
+            totals_list = stage_totals_dict.setdefault(row['stage'], [0.0, 0.0, 0.0, 0.0])
+            for index, column in enumerate(stage_columns_list[2:]):
+                totals_list[index] += row[column]
+
+        print('')
+        print(f"{'stage':<24}{'wall':>10}{'cpu':>10}{'children':>10}{'wait':>10}")
+        for stage_name, totals_list in stage_totals_dict.items():
+            print(f'{stage_name:<24}' + ''.join(f'{x:>10.1f}' for x in totals_list))
+        print(f'Profile of {len(self.stage_rows_list)} stages written to {self.output_directory_path}')
+        print('')
+
+        return self.output_directory_path
+
+
+# shared by the entry points, off unless start() is called, e.g. for --profile
+default_run_profiler = RunProfiler()
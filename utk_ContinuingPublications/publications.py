@@ -0,0 +1,284 @@
+from dateutil.parser import parse
+
+from utk_ContinuingPublications.admindb import allocate_adminDB_items, format_adminDB
+from utk_ContinuingPublications.common import get_season_code
+from utk_ContinuingPublications.volume import ContinuingPublications_Volume
+from utk_ContinuingPublications.workqueue import get_volume_paths
+
+
+def lazy_metadata(name):
+    '''
+    -- Purpose --
+    Create a read-only attribute that looks name up in self.metadata, so metadata is
+    only parsed when it is first used
+
+    -- Arguments --
+    name: type=string; key in the dictionary returned by parse_metadata()
+
+    -- Returns --
+    property: type=property; attribute for the class body
+    '''
+    return property(lambda self: self.metadata[name])
+
+
+class ContinuingPublications_Publication(ContinuingPublications_Volume):
+    '''
+    Base class for publications with YAML metadata parsed from the directory name
+    Subclasses implement parse_metadata()
+    '''
+
+    __slots__ = ('_metadata',)
+
+    # YAML workflow: ingest directory keeps the volume's name and goes in "book"
+    default_backends_dict = {'rename': 'directory_name_upper',
+                             'backup': 'verified',
+                             'ingest_layout': 'move_pages_in_place',
+                             'package': 'book_directory'}
+
+    def __init__(self, directory, **backends):
+        super().__init__(directory, **backends)
+        self._metadata = None
+
+    @property
+    def metadata(self):
+        # parse the directory name and format the YAML rows once, on first access
+        if self._metadata is None:
+            self._metadata = self.parse_metadata()
+        return self._metadata
+
+    def parse_metadata(self):
+        raise NotImplementedError
+
+    yaml_rows_list = lazy_metadata('yaml_rows_list')
+
+
+class Playbills(ContinuingPublications_Publication):
+    '''Name directories with YYYY-MM-DD_Title_of_Playbill'''
+
+    __slots__ = ('adminDB_collection', 'adminDB_item')
+
+    def __init__(self, directory, adminDB_collection, adminDB_item, **backends):
+        # load ContinuingPublications_Publication class
+        super().__init__(directory, **backends)
+        self.adminDB_collection = adminDB_collection
+        self.adminDB_item = adminDB_item
+
+    def parse_metadata(self):
+        '''
+        -- Purpose --
+        Get metadata from the directory name, ex: 2018-10-04_It's_a_Wonderful_Life
+
+        -- Arguments --
+        None
+
+        -- Returns --
+        metadata: type=dictionary; metadata values and YAML rows by attribute name
+        '''
+        metadata = {}
+
+        # get metadata from filename
+        metadata['date'], metadata['title'] = self.directory_path.name.split('_', maxsplit=1)
+        metadata['title_replace_underscores'] = metadata['title'].replace('_', ' ')
+        metadata['yyyy'], metadata['mm'], metadata['dd'] = metadata['date'].split('-')
+        metadata['parsed_date'] = parse(metadata['date'])
+        metadata['month'] = metadata['parsed_date'].strftime("%B")
+
+        # cast dd as int to remove a possible leading zero
+        metadata['date_issued'] = f"{metadata['month']} {int(metadata['dd'])}, {metadata['yyyy']}"
+        metadata['date_issued_edtf'] = metadata['date']
+        metadata['adminDB'] = format_adminDB(self.adminDB_collection, self.adminDB_item)
+        metadata['yaml_rows_list'] = [f'''adminDB: "{metadata['adminDB']}"''',
+                                      f'''title: "{metadata['title_replace_underscores']}"''',
+                                      f'''date_issued: "{metadata['date_issued']}"''',
+                                      f'''date_issued_edtf: "{metadata['date_issued_edtf']}"''']
+
+        return metadata
+
+    date = lazy_metadata('date')
+    title = lazy_metadata('title')
+    title_replace_underscores = lazy_metadata('title_replace_underscores')
+    yyyy = lazy_metadata('yyyy')
+    mm = lazy_metadata('mm')
+    dd = lazy_metadata('dd')
+    parsed_date = lazy_metadata('parsed_date')
+    month = lazy_metadata('month')
+    date_issued = lazy_metadata('date_issued')
+    date_issued_edtf = lazy_metadata('date_issued_edtf')
+    adminDB = lazy_metadata('adminDB')
+
+
+class Phoenix(ContinuingPublications_Publication):
+    '''Name directories: phoenix_YYYY-season'''
+
+    __slots__ = ()
+
+    def parse_metadata(self):
+        metadata = {}
+
+        # get metadata from filename, ex: phoenix_2018-winter
+        metadata['title'], metadata['date'] = self.directory_path.name.split('_', maxsplit=1)
+        metadata['yyyy'], season = metadata['date'].split('-')
+        # seasons should be lowercase
+        metadata['season'] = season.lower()
+        # get season code
+        metadata['season_code'] = get_season_code(metadata['season'])  # season code is string
+        metadata['date_issued_edtf'] = f"{metadata['yyyy']}-{metadata['season_code']}"
+        metadata['yaml_rows_list'] = [f'''year: "{metadata['yyyy']}"''',
+                                      f'''season: "{metadata['season']}"''',
+                                      f'''date_issued_edtf: "{metadata['date_issued_edtf']}"''']
+
+        return metadata
+
+    title = lazy_metadata('title')
+    date = lazy_metadata('date')
+    yyyy = lazy_metadata('yyyy')
+    season = lazy_metadata('season')
+    season_code = lazy_metadata('season_code')
+    date_issued_edtf = lazy_metadata('date_issued_edtf')
+
+
+class Torchbearer(ContinuingPublications_Publication):
+    '''Name directories: torchbearer_VV-N_YYYY-season'''
+
+    __slots__ = ()
+
+    def parse_metadata(self):
+        metadata = {}
+
+        # get metadata from filename, ex: torchbearer_v53-n2_2018-fall
+        metadata['title'], metadata['volume_info'], metadata['date'] = self.directory_path.name.split('_')
+        metadata['volume'], metadata['number'] = metadata['volume_info'].split('-')
+        metadata['yyyy'], season = metadata['date'].split('-')
+        # seasons should be lowercase
+        metadata['season'] = season.lower()
+        # get season code
+        metadata['season_code'] = get_season_code(metadata['season'])  # season code is string
+        metadata['date_issued'] = f"{metadata['season'].capitalize()} {metadata['yyyy']}"
+        metadata['date_issued_edtf'] = f"{metadata['yyyy']}-{metadata['season_code']}"
+        metadata['yaml_rows_list'] = [f'''volume: "{metadata['volume']}"''',
+                                      f'''number: "{metadata['number']}"''',
+                                      f'''date_issued: "{metadata['date_issued']}"''',
+                                      f'''date_issued_edtf: "{metadata['date_issued_edtf']}"''']
+
+        return metadata
+
+    title = lazy_metadata('title')
+    volume_info = lazy_metadata('volume_info')
+    date = lazy_metadata('date')
+    volume = lazy_metadata('volume')
+    number = lazy_metadata('number')
+    yyyy = lazy_metadata('yyyy')
+    season = lazy_metadata('season')
+    season_code = lazy_metadata('season_code')
+    date_issued = lazy_metadata('date_issued')
+    date_issued_edtf = lazy_metadata('date_issued_edtf')
+
+
+class SMHC_Handbook(ContinuingPublications_Publication):
+    '''Name directories: smhc-handbook_YYYY'''
+
+    __slots__ = ()
+
+    def parse_metadata(self):
+        metadata = {}
+
+        # get metadata from filename, ex: smhc-handbook_1935
+        metadata['title'], metadata['yyyy'] = self.directory_path.name.split('_')
+        metadata['yaml_rows_list'] = [f'''title: "{metadata['yyyy']} Handbook of the Smoky Mountains Hiking Club"''',
+                                      f'''year: "{metadata['yyyy']}"''']
+
+        return metadata
+
+    title = lazy_metadata('title')
+    yyyy = lazy_metadata('yyyy')
+
+
+class Commencements(ContinuingPublications_Publication):
+    '''Name directories: commencement_YYYY-season'''
+
+    __slots__ = ()
+
+    def parse_metadata(self):
+        metadata = {}
+
+        # get metadata from filename, ex: commencement_2018-fall
+        metadata['title'], metadata['date'] = self.directory_path.name.split('_')
+        metadata['yyyy'], season = metadata['date'].split('-')
+        # seasons should be lowercase
+        metadata['season'] = season.lower()
+        # get season code
+        metadata['season_code'] = get_season_code(metadata['season'])  # season code is string
+        metadata['date_created_edtf'] = f"{metadata['yyyy']}-{metadata['season_code']}"
+        metadata['yaml_rows_list'] = [f'''year: "{metadata['yyyy']}"''',
+                                      f'''season: "{metadata['season']}"''',
+                                      f'''date_created_edtf: "{metadata['date_created_edtf']}"''']
+
+        return metadata
+
+    title = lazy_metadata('title')
+    date = lazy_metadata('date')
+    yyyy = lazy_metadata('yyyy')
+    season = lazy_metadata('season')
+    season_code = lazy_metadata('season_code')
+    date_created_edtf = lazy_metadata('date_created_edtf')
+
+
+class Alumnus(ContinuingPublications_Publication):
+    '''Name directories: alumnus_YYYY-season'''
+
+    __slots__ = ()
+
+    def parse_metadata(self):
+        metadata = {}
+
+        # get metadata from filename, ex: alumnus_2014-fall
+        metadata['title'], metadata['date'] = self.directory_path.name.split('_')
+        metadata['yyyy'], season = metadata['date'].split('-')
+        # seasons should be lowercase
+        metadata['season'] = season.lower()
+        # get season code
+        metadata['season_code'] = get_season_code(metadata['season'])  # season code is string
+        metadata['date_issued_edtf'] = f"{metadata['yyyy']}-{metadata['season_code']}"
+        metadata['yaml_rows_list'] = [f'''year: "{metadata['yyyy']}"''',
+                                      f'''season: "{metadata['season']}"''',
+                                      f'''date_issued_edtf: "{metadata['date_issued_edtf']}"''']
+
+        return metadata
+
+    title = lazy_metadata('title')
+    date = lazy_metadata('date')
+    yyyy = lazy_metadata('yyyy')
+    season = lazy_metadata('season')
+    season_code = lazy_metadata('season_code')
+    date_issued_edtf = lazy_metadata('date_issued_edtf')
+
+
+def batch_process_playbills(root_directory_path, adminDB_collection, adminDB_next_item, adminDB_store_path):
+    '''
+    -- Purpose --
+    Process every Playbills directory in root_directory_path
+
+    -- Arguments --
+    root_directory_path: type=Path-like object; directory with 1 sub-directory per playbill
+    adminDB_collection: type=integer; adminDB collection number
+    adminDB_next_item: type=integer; next free adminDB item number
+    adminDB_store_path: type=Path-like object; adminDB reservation store on the
+    shared drive, see admindb.reserve_adminDB_range()
+
+    -- Returns --
+    None
+    '''
+    # skips backups, "book", and hidden directories like .volume_journals
+    directory_paths_list = get_volume_paths(root_directory_path)
+
+    print(f'Processing {len(directory_paths_list)} directories')
+
+    # reserve 1 adminDB item per directory up front, re-running the batch re-uses the same items
+    adminDB_items_dict = allocate_adminDB_items(directory_paths_list, adminDB_collection, adminDB_store_path,
+                                                first_item=adminDB_next_item)
+
+    for directory_path in directory_paths_list:
+
+        volume = Playbills(directory_path, adminDB_collection, adminDB_items_dict[directory_path.name])
+        print(volume.directory_path)
+        volume.process_publication()
@@ -0,0 +1,132 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+# rendered pages are cached by page content so re-splitting a fixed or renamed
+# PDF only renders the pages that changed
+default_cache_directory_path = Path.home().joinpath('.cache', 'utk_ContinuingPublications', 'rasters')
+default_max_gigabytes = 20
+
+
+def get_raster_key(page_key, dpi, colorspace):
+    '''
+    -- Purpose --
+    Combine a page's content key with the render settings into 1 cache key
+
+    -- Arguments --
+    page_key: type=string; content key from the PDF document's get_page_key()
+    dpi: type=integer; output resolution
+    colorspace: type=string; output colorspace, e.g. 'sRGB'
+
+    -- Returns --
+    raster_key: type=string; SHA-256 hex digest
+    '''
+    return hashlib.sha256(f'{page_key}|{dpi}|{colorspace}'.encode('utf-8')).hexdigest()
+
+
+class RasterCache:
+    '''
+    Size-bounded cache of rendered page TIFFs on local disk
+
+    Entries are <cache_directory>/<key[:2]>/<key>.tif. Using an entry touches its
+    modification time, and when the cache grows past max_gigabytes the least
+    recently used entries are deleted.
+
+    Entries are copied in and out rather than hard linked, so editing a page TIFF
+    in place can't change the cached copy.
+    '''
+
+    def __init__(self, cache_directory=default_cache_directory_path, max_gigabytes=default_max_gigabytes):
+        self.cache_directory_path = Path(cache_directory)
+        self.cache_directory_path.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_gigabytes * 1024 ** 3)
+        self.lock = threading.Lock()
+        self.total_bytes = None  # counted on the first put()
+
+    def get_entry_path(self, raster_key):
+        return self.cache_directory_path.joinpath(raster_key[:2], f'{raster_key}.tif')
+
+    def get(self, raster_key, output_path):
+        '''
+        -- Purpose --
+        Put the cached page for raster_key at output_path
+
+        -- Arguments --
+        raster_key: type=string; from get_raster_key()
+        output_path: type=Path-like object; TIFF to create
+
+        -- Returns --
+        True/False: type=boolean; True if the page was in the cache
+        '''
+        entry_path = self.get_entry_path(raster_key)
+        try:
+            os.utime(entry_path)  # most recently used
+            shutil.copyfile(entry_path, output_path)
+        except FileNotFoundError:  # not cached, or evicted by another process
+            return False
+        return True
+
+    def put(self, raster_key, rendered_path):
+        '''
+        -- Purpose --
+        Add a rendered page TIFF to the cache, then evict old entries if the cache
+        is over its size
+
+        -- Arguments --
+        raster_key: type=string; from get_raster_key()
+        rendered_path: type=Path-like object; TIFF that was just rendered
+
+        -- Returns --
+        None
+        '''
+        entry_path = self.get_entry_path(raster_key)
+        entry_path.parents[0].mkdir(exist_ok=True)
+
+        # a re-render replaces the entry, so its old size comes off the total
+        try:
+            replaced_bytes = entry_path.stat().st_size
+        except FileNotFoundError:
+            replaced_bytes = 0
+
+        # add under a temporary name and rename so a half-written entry is never used
+        file_descriptor, temporary_name = tempfile.mkstemp(dir=entry_path.parents[0], suffix='.tmp')
+        os.close(file_descriptor)
+        shutil.copyfile(rendered_path, temporary_name)
+        os.replace(temporary_name, entry_path)
+
+        with self.lock:
+            if self.total_bytes is None:
+                self.total_bytes = sum(x.stat().st_size for x in self.cache_directory_path.glob('*/*.tif'))
+            else:
+                self.total_bytes += entry_path.stat().st_size - replaced_bytes
+            if self.total_bytes > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        # called with self.lock held: delete least recently used entries down to 90% of max_bytes
+        entries_list = []
+        for entry_path in self.cache_directory_path.glob('*/*.tif'):
+            try:
+                entry_stat = entry_path.stat()
+            except FileNotFoundError:
+                continue
+            entries_list.append((entry_stat.st_mtime, entry_stat.st_size, entry_path))
+        entries_list.sort()
+
+        self.total_bytes = sum(x[1] for x in entries_list)
+        target_bytes = self.max_bytes * 0.9
+        number_evicted = 0
+        for _, size, entry_path in entries_list:
+            if self.total_bytes <= target_bytes:
+                break
+            try:
+                entry_path.unlink()
+            except FileNotFoundError:
+                pass
+            self.total_bytes -= size
+            number_evicted += 1
+
+        print(f'Evicted {number_evicted} pages from the raster cache')
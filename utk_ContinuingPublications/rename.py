@@ -0,0 +1,250 @@
+import datetime
+import os
+import re
+from pathlib import Path
+
+from utk_ContinuingPublications.journal import VolumeJournal, read_journal, restore_volume
+
+# renames are recorded in <root directory>/.volume_journals/directory_renames.jsonl,
+# next to the volume journals, so rollback_run() can undo them too
+rename_journal_name = 'directory_renames'
+
+
+# ===== Rename functions
+# each returns a function that takes a directory name and returns the new name,
+# or None to leave the directory alone
+
+def regex_rename(pattern, replacement):
+    '''
+    -- Purpose --
+    Rename names that fully match pattern using re's replacement syntax, e.g. \\1 or \\g<name>
+
+    -- Arguments --
+    pattern: type=string; regular expression the whole name must match
+    replacement: type=string; replacement template
+
+    -- Returns --
+    rename_function: type=function; name -> new name or None
+    '''
+    compiled_pattern = re.compile(pattern)
+
+    def rename_function(name):
+        match = compiled_pattern.fullmatch(name)
+        if match is None:
+            return None
+        return match.expand(replacement)
+
+    return rename_function
+
+
+def template_rename(pattern, template):
+    '''
+    -- Purpose --
+    Rename names that fully match pattern by filling template with the named groups,
+    e.g. template_rename(r'(?P<year>\\d{4})(?P<season>[a-z]+)', 'alumnus_VV-I_{year}-{season}')
+
+    -- Arguments --
+    pattern: type=string; regular expression with named groups
+    template: type=string; str.format template using the group names
+
+    -- Returns --
+    rename_function: type=function; name -> new name or None
+    '''
+    compiled_pattern = re.compile(pattern)
+
+    def rename_function(name):
+        match = compiled_pattern.fullmatch(name)
+        if match is None:
+            return None
+        return template.format(**match.groupdict())
+
+    return rename_function
+
+
+def strip_suffix_rename(suffix='_backup'):
+    '''
+    -- Purpose --
+    Remove suffix from names ending with it, e.g. phoenix_2015fall_backup -> phoenix_2015fall
+
+    -- Arguments --
+    suffix: type=string; suffix to remove
+
+    -- Returns --
+    rename_function: type=function; name -> new name or None
+    '''
+    return regex_rename(f'(.+){re.escape(suffix)}', r'\1')
+
+
+# ===== Planning
+
+def plan_directory_renames(root_directory, rename_function, displace_existing=False):
+    '''
+    -- Purpose --
+    Work out every rename in root_directory before touching anything. Names are
+    compared case-insensitively so plans are safe on Windows and macOS shares.
+
+    -- Arguments --
+    root_directory: type=Path-like object; directory with the directories to rename
+    rename_function: type=function; name -> new name or None, see regex_rename()
+    displace_existing: type=boolean; if a target name is taken by a directory that is
+    not being renamed, move that directory aside instead of refusing the plan
+
+    -- Returns --
+    renames_list: type=list; (source name, target name) tuples, sorted by source name
+    displaced_names_list: type=list; names of directories in the way of a target
+
+    Raises ValueError listing every collision if the plan can't be carried out
+    '''
+    entries_list = list(os.scandir(root_directory))
+    names_list = sorted(entry.name for entry in entries_list
+                        if entry.is_dir() and not entry.name.startswith('.'))
+    names_dict = {name.casefold(): name for name in names_list}
+    all_names_set = {entry.name.casefold() for entry in entries_list}
+
+    renames_list = []
+    for name in names_list:
+        new_name = rename_function(name)
+        if new_name is None or new_name == name:
+            continue
+        if not new_name or new_name in ('.', '..') or '/' in new_name or '\\' in new_name:
+            raise ValueError(f'{name} would be renamed to an invalid name: {new_name!r}')
+        renames_list.append((name, new_name))
+
+    sources_set = {name.casefold() for name, new_name in renames_list}
+
+    collisions_list = []
+    displaced_names_list = []
+    targets_dict = {}
+    for name, new_name in renames_list:
+        target_key = new_name.casefold()
+
+        # 2 directories can't end up with the same name
+        if target_key in targets_dict:
+            collisions_list.append(f'{targets_dict[target_key]} and {name} would both become {new_name}')
+            continue
+        targets_dict[target_key] = name
+
+        # the target is free, or it will be freed by another rename in the plan
+        if target_key not in all_names_set or target_key in sources_set:
+            continue
+
+        # only directories can be moved aside, never files
+        if displace_existing and target_key in names_dict:
+            displaced_names_list.append(names_dict[target_key])
+        else:
+            collisions_list.append(f'{name} -> {new_name}: {new_name} already exists')
+
+    if collisions_list:
+        for collision in collisions_list:
+            print(f'COLLISION: {collision}')
+        raise ValueError(f'{len(collisions_list)} collisions planning renames in {root_directory}')
+
+    return renames_list, displaced_names_list
+
+
+# ===== Execution
+
+def get_rename_journal(root_directory, run_id=None):
+    # VolumeJournal puts <directory>.jsonl in .volume_journals next to <directory>
+    return VolumeJournal(Path(os.path.abspath(root_directory)).joinpath(rename_journal_name), run_id)
+
+
+def rename_directories(root_directory, rename_function, displace_existing=False, dry_run=False):
+    '''
+    -- Purpose --
+    Plan and carry out every rename in root_directory in 1 pass, recording each
+    rename in the root directory's journal so undo_renames() or rollback_run() can
+    reverse it. Chains and cycles (a -> b, b -> a) go through temporary names.
+
+    -- Arguments --
+    root_directory: type=Path-like object; directory with the directories to rename
+    rename_function: type=function; name -> new name or None, see regex_rename()
+    displace_existing: type=boolean; move directories in the way of a target into
+    <root_directory>/.displaced_<run id>/ instead of refusing
+    dry_run: type=boolean; print the plan without renaming anything
+
+    -- Returns --
+    run_id: type=string; journal run id of this pass, None for a dry run or if
+    there was nothing to rename
+    '''
+    # journal absolute paths so it can be undone from any working directory
+    root_directory_path = Path(os.path.abspath(root_directory))
+    renames_list, displaced_names_list = plan_directory_renames(root_directory_path, rename_function,
+                                                                displace_existing)
+
+    print(f'{len(renames_list)} directories to rename in {root_directory_path}')
+    if displaced_names_list:
+        print(f'{len(displaced_names_list)} directories in the way will be moved aside')
+
+    if dry_run:
+        for name in displaced_names_list:
+            print(f'{name} -> (moved aside)')
+        for name, new_name in renames_list:
+            print(f'{name} -> {new_name}')
+        return None
+
+    if not renames_list:
+        return None
+
+    # 1 run per pass, so undo_renames() reverses just this pass; sorts with the
+    # run ids of processing runs
+    run_id = f"{datetime.datetime.now().strftime('%Y-%m-%d_%H%M%S_%f')}_renames"
+    journal = get_rename_journal(root_directory_path, run_id)
+    displaced_directory_path = root_directory_path.joinpath(f'.displaced_{run_id}')
+
+    sources_set = {name.casefold() for name, new_name in renames_list}
+
+    # each rename is journaled as it happens so a crash can still be undone
+    try:
+        # move directories that are in the way of a target
+        if displaced_names_list:
+            journal.mkdir(displaced_directory_path)
+        for name in displaced_names_list:
+            journal.rename(root_directory_path.joinpath(name), displaced_directory_path.joinpath(name))
+
+        # renames onto a name that is itself being renamed go through a temporary name
+        temporary_renames_list = []
+        for index, (name, new_name) in enumerate(renames_list):
+            source_path = root_directory_path.joinpath(name)
+            if new_name.casefold() in sources_set:
+                temporary_path = root_directory_path.joinpath(f'.renaming_{run_id}_{index}')
+                journal.rename(source_path, temporary_path)
+                temporary_renames_list.append((temporary_path, new_name))
+            else:
+                journal.rename(source_path, root_directory_path.joinpath(new_name))
+
+        for temporary_path, new_name in temporary_renames_list:
+            journal.rename(temporary_path, root_directory_path.joinpath(new_name))
+    finally:
+        journal.close()
+
+    print(f' Renamed {len(renames_list)} directories, undo with undo_renames(root_directory, {run_id!r})')
+    print('')
+
+    return run_id
+
+
+def undo_renames(root_directory, run_id=None):
+    '''
+    -- Purpose --
+    Reverse the renames of 1 rename_directories() pass, newest first, see
+    restore_volume(). Nothing is moved if a directory has since taken a name
+    that a rename would move back to.
+
+    -- Arguments --
+    root_directory: type=Path-like object; directory passed to rename_directories()
+    run_id: type=string; run id returned by rename_directories(), None for the
+    most recent pass
+
+    -- Returns --
+    number_of_renames: type=integer; number of renames reversed
+    '''
+    journal_path = get_rename_journal(root_directory).journal_path
+    if not journal_path.is_file():
+        print(f'No renames to undo in {root_directory}')
+        return 0
+
+    if run_id is None:
+        run_id = sorted({x['run'] for x in read_journal(journal_path)})[-1]
+
+    return restore_volume(journal_path, run_id)
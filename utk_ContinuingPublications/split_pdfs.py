@@ -0,0 +1,276 @@
+import hashlib
+import re
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+
+from PIL import Image
+
+try:  # in-process rendering
+    import pymupdf
+except ImportError:  # fall back to ImageMagick
+    pymupdf = None
+
+from utk_ContinuingPublications.common import get_file_hash
+from utk_ContinuingPublications.raster_cache import RasterCache, get_raster_key
+
+# every page is rendered to 8-bit sRGB
+colorspace = 'sRGB'
+
+# indirect references in a PDF object, e.g. 12 0 R
+reference_pattern = re.compile(r'(\d+) \d+ R\b')
+# references that lead to other pages, not to what this page draws
+other_page_reference_pattern = re.compile(r'/(Parent|P|Dest|Prev|Next|First|Last|B|Thumb)\s+\d+ \d+ R\b')
+
+
+class PyMuPDF_Document:
+    '''In-process PDF rendering with PyMuPDF, the PDF is parsed once per document'''
+
+    def __init__(self, pdf_path):
+        self.pdf_path = Path(pdf_path)
+        self.document = pymupdf.open(str(self.pdf_path))
+        # PDFs with an empty user password, e.g. only an owner password, open without
+        # authenticating and aren't is_encrypted, but they're still encrypted files,
+        # same as PyPDF2's isEncrypted
+        self.encrypted = bool(self.document.needs_pass or self.document.metadata.get('encryption'))
+        self.number_of_pages = self.document.page_count
+
+    def get_object_hash(self, xref, object_hashes_dict, xrefs_in_progress_list):
+        # hash of an object with every reference replaced by the hash of the object it
+        # points to, so renumbering objects, e.g. a save with garbage collection,
+        # doesn't change it
+        if xref in object_hashes_dict:
+            return object_hashes_dict[xref]
+        if xref in xrefs_in_progress_list:  # a cycle, refer to it by how far back it is
+            return f'cycle{len(xrefs_in_progress_list) - xrefs_in_progress_list.index(xref)}'
+        xrefs_in_progress_list.append(xref)
+
+        pdf_object = other_page_reference_pattern.sub('', self.document.xref_object(xref, compressed=True))
+        object_hash = hashlib.sha256(reference_pattern.sub(
+            lambda x: self.get_object_hash(int(x.group(1)), object_hashes_dict, xrefs_in_progress_list),
+            pdf_object).encode('utf-8'))
+        if self.document.xref_is_stream(xref):
+            object_hash.update(self.document.xref_stream_raw(xref))
+
+        xrefs_in_progress_list.pop()
+        object_hashes_dict[xref] = object_hash.hexdigest()
+        return object_hashes_dict[xref]
+
+    def get_page_key(self, page_index):
+        '''
+        -- Purpose --
+        Get a key that only changes if what's drawn on a page changes: the page's
+        size and rotation, and every object the page uses (content streams, images,
+        fonts, forms, annotations), raw and undecoded. Other pages of the PDF, its
+        file name, its metadata, and the object numbers aren't part of the key.
+
+        -- Arguments --
+        page_index: type=integer; 0-based page index
+
+        -- Returns --
+        page_key: type=string; 'pymupdf:' and a SHA-256 hex digest
+        '''
+        page = self.document[page_index]
+        page_hash = hashlib.sha256(f'{tuple(page.mediabox)}|{tuple(page.cropbox)}|{page.rotation}'.encode('utf-8'))
+
+        # resources inherited from the page tree are found by get_images(), etc.
+        xrefs_list = [page.xref] + [x[0] for x in page.get_images(full=True)]
+        xrefs_list += [x[0] for x in page.get_fonts(full=True)] + [x[0] for x in page.get_xobjects()]
+        object_hashes_dict = {}
+        object_hashes_list = [self.get_object_hash(x, object_hashes_dict, []) for x in set(xrefs_list) if x > 0]
+        for object_hash in sorted(object_hashes_list):
+            page_hash.update(object_hash.encode('utf-8'))
+
+        return f'pymupdf:{page_hash.hexdigest()}'
+
+    def render_page(self, page_index, dpi):
+        '''
+        -- Purpose --
+        Rasterize a page to an 8-bit sRGB Pillow image
+
+        -- Arguments --
+        page_index: type=integer; 0-based page index
+        dpi: type=integer; output resolution
+
+        -- Returns --
+        image: type=PIL.Image; rendered page
+        '''
+        pixmap = self.document[page_index].get_pixmap(dpi=dpi, colorspace=pymupdf.csRGB, alpha=False)
+        return Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+
+    def close(self):
+        self.document.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Magick_Document:
+    '''
+    Fallback rendering with ImageMagick 7+ (and Ghostscript), 1 subprocess per page
+    Page count and size come from PyPDF2
+    '''
+
+    def __init__(self, pdf_path):
+        from PyPDF2 import PdfFileReader
+
+        self.pdf_path = Path(pdf_path)
+        self.pdf_file = open(self.pdf_path, 'rb')
+        self.pdf = PdfFileReader(self.pdf_file)
+        self.encrypted = self.pdf.isEncrypted
+        if self.encrypted:  # try the empty user password
+            self.pdf.decrypt('')
+        self.number_of_pages = self.pdf.getNumPages()
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.file_hash = None  # hashed on the first get_page_key()
+
+    def get_page_key(self, page_index):
+        # PyPDF2 can't easily tell which objects a page uses, so any change to the PDF
+        # changes every page's key; renaming the PDF doesn't
+        if self.file_hash is None:
+            self.file_hash = get_file_hash(self.pdf_path)
+        return f'magick:{self.file_hash}:{page_index}'
+
+    def render_page(self, page_index, dpi, jpeg_quality=100):
+        temporary_image_path = Path(self.temporary_directory.name).joinpath(f'{page_index}.jpeg')
+
+        # convert PDF page to sRGB, 8-bit, with {dpi} settings
+        subprocess.run(['magick', f'{self.pdf_path}[{page_index}]',
+                        '-colorspace', 'sRGB', '-depth', '8',
+                        '-density', f'{dpi}x{dpi}', '-units', 'pixelsperinch',
+                        '-quality', str(jpeg_quality), str(temporary_image_path)],
+                       check=True)
+
+        # load the pixels so the temporary file can be deleted right away
+        with Image.open(temporary_image_path) as image:
+            image.load()
+        temporary_image_path.unlink()
+
+        return image
+
+    def close(self):
+        self.pdf_file.close()
+        self.temporary_directory.cleanup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+pdf_backends_dict = {'pymupdf': PyMuPDF_Document,
+                     'magick': Magick_Document}
+
+
+def get_pdf_backend(backend=None):
+    '''
+    -- Purpose --
+    Get the class used to open PDFs. PyMuPDF is preferred, ImageMagick is the fallback
+
+    -- Arguments --
+    backend: type=string; 'pymupdf', 'magick', or None to pick the first available
+
+    -- Returns --
+    document_class: type=class; PyMuPDF_Document or Magick_Document
+    '''
+    if backend is not None:
+        return pdf_backends_dict[backend]
+
+    if pymupdf is not None:
+        return PyMuPDF_Document
+
+    # make sure you have ImageMagick 7+ installed, it uses Ghostscript to read PDFs
+    if shutil.which('magick') is None:
+        raise RuntimeError('Install PyMuPDF or ImageMagick 7+ and Ghostscript to split PDFs')
+
+    return Magick_Document
+
+
+def split_pdf_into_tiffs(pdf_path, dpi=600, backend=None, cache=True, overwrite=False):
+    '''
+    -- Purpose --
+    Rasterize every page of a PDF into {pdf_path.stem}/{pdf_path.stem}_0001.tif, etc.
+    next to the PDF. The PDF is skipped if the output directory already exists so
+    nothing is overwritten, unless overwrite is True.
+
+    Rendered pages are kept in a RasterCache keyed by page content, dpi, and
+    colorspace, so re-splitting a fixed or renamed PDF only renders the pages that
+    changed.
+
+    -- Arguments --
+    pdf_path: type=Path-like object; PDF to split
+    dpi: type=integer; output resolution, use 600 for high-quality OCR
+    backend: type=string; see get_pdf_backend()
+    cache: type=RasterCache or boolean; True for the default cache, False for no cache
+    overwrite: type=boolean; replace the TIFFs in an existing output directory
+
+    -- Returns --
+    final_output_directory_path: type=Path-like object; directory with the TIFFs,
+    None if the PDF was skipped
+    '''
+    pdf_path = Path(pdf_path)
+    document_class = get_pdf_backend(backend)
+    if cache is True:
+        cache = RasterCache()
+
+    print(f'Processing {pdf_path.name} . . .')
+
+    # try to create final output directory
+    final_output_directory_path = pdf_path.parents[0].joinpath(pdf_path.stem)
+    try:
+        final_output_directory_path.mkdir()
+    except FileExistsError:  # breaks if directory already exists so we don't overwrite anything
+        if not overwrite:
+            print('********************************************')
+            print(f'Output directory already exists for {pdf_path.name}; file will be skipped, re-run with overwrite=True to process')
+            print('')
+            return None
+        print(f'Replacing TIFFs in {final_output_directory_path}')
+
+    with document_class(pdf_path) as document:
+        number_of_pages = document.number_of_pages
+        print(f'# of pages: {number_of_pages}')
+
+        number_rendered = 0
+        output_names_set = set()
+        for page_index in range(number_of_pages):
+            output_name = f'{pdf_path.stem}_{str(page_index + 1).zfill(4)}.tif'
+            output_names_set.add(output_name)
+            final_output_path = final_output_directory_path.joinpath(output_name)
+
+            if cache:
+                raster_key = get_raster_key(document.get_page_key(page_index), dpi, colorspace)
+                if cache.get(raster_key, final_output_path):
+                    continue
+
+            image = document.render_page(page_index, dpi)
+            image.save(final_output_path, dpi=(dpi, dpi))
+            image.close()
+            number_rendered += 1
+
+            if cache:
+                cache.put(raster_key, final_output_path)
+
+    # pages left over from a longer version of the PDF
+    for image_path in final_output_directory_path.glob(f'{pdf_path.stem}_*.tif'):
+        if image_path.name not in output_names_set:
+            image_path.unlink()
+
+    print(f'{number_rendered} pages rendered, {number_of_pages - number_rendered} from the cache')
+
+    image_paths_list = list(final_output_directory_path.glob('*.tif'))
+    number_of_images = len(image_paths_list)
+    if number_of_images == number_of_pages:
+        print(f'{number_of_images} TIFFs created in {final_output_directory_path}')
+        print('')
+    else:
+        print('********************************************')
+        print(f'# of pages DOES NOT EQUAL # of final TIFFs: {number_of_pages} != {number_of_images}')
+        print('')
+
+    return final_output_directory_path
@@ -0,0 +1,275 @@
+import datetime
+import os
+import shutil
+
+from utk_ContinuingPublications.backup import backup_directory
+from utk_ContinuingPublications.io_scheduler import default_io_scheduler
+from utk_ContinuingPublications.multipage_tiff import assemble_multipage_tiff, get_ingest_page_paths
+from utk_ContinuingPublications.page_index import get_page_number
+
+# stage -> backend name -> function
+# every backend takes the volume as its first argument, see the stage's
+# docstring below for the rest. Register new engines with register_stage_backend
+# and pick them per volume, e.g. ContinuingPublications_Volume(path, rename='my_engine')
+stage_backends_dict = {'rename': {},
+                       'backup': {},
+                       'ingest_layout': {},
+                       'package': {}}
+
+
+def register_stage_backend(stage, name):
+    '''
+    -- Purpose --
+    Decorator that registers a function as a backend for a pipeline stage
+
+    -- Arguments --
+    stage: type=string; 'rename', 'backup', 'ingest_layout', or 'package'
+    name: type=string; backend name used to select it
+
+    -- Returns --
+    decorator: type=function; returns the decorated function unchanged
+    '''
+    if stage not in stage_backends_dict:
+        raise ValueError(f'Unknown stage {stage!r}, expected one of {sorted(stage_backends_dict)}')
+
+    def decorator(function):
+        stage_backends_dict[stage][name] = function
+        return function
+
+    return decorator
+
+
+def get_stage_backend(stage, backend):
+    '''
+    -- Purpose --
+    Look up a registered backend for a pipeline stage
+
+    -- Arguments --
+    stage: type=string; 'rename', 'backup', 'ingest_layout', or 'package'
+    backend: type=string or function; backend name, or a function to use as-is
+
+    -- Returns --
+    function: type=function; the backend
+    '''
+    if callable(backend):
+        return backend
+    try:
+        return stage_backends_dict[stage][backend]
+    except KeyError:
+        raise ValueError(f'Unknown {stage} backend {backend!r}, expected one of {sorted(stage_backends_dict[stage])}')
+
+
+def get_todays_date():
+    # get today's date in YYYY-MM-DD format
+    return datetime.datetime.now().strftime('%Y-%m-%d')
+
+
+# ===== rename: (volume, file_paths_list, extension, zerofill) -> number of files renamed
+
+@register_stage_backend('rename', 'directory_name')
+def rename_to_directory_name(volume, file_paths_list, extension, zerofill):
+    # <directory>_0001.tif, <directory>_0002.tif, etc.
+    renames_list = []
+    for index, file_path in enumerate(file_paths_list, start=1):
+        new_file_name = f'{volume.directory_path.name}_{str(index).zfill(zerofill)}{extension}'
+        renames_list.append((file_path, file_path.parents[0].joinpath(new_file_name)))
+    volume.journal.rename_all(renames_list)
+    return len(renames_list)
+
+
+@register_stage_backend('rename', 'directory_name_upper')
+def rename_to_upper_directory_name(volume, file_paths_list, extension, zerofill):
+    # rename TIFF files from Adobe Acrobat for Islandora ingest, i.e. FILENAME.extension
+    renames_list = []
+    for index, file_path in enumerate(file_paths_list, start=1):
+        new_file_name = f'{volume.directory_path.name.upper()}_{str(index).zfill(zerofill)}{extension}'
+        renames_list.append((file_path, file_path.parents[0].joinpath(new_file_name)))
+    volume.journal.rename_all(renames_list)
+    return len(renames_list)
+
+
+# ===== backup: (volume, backup_directory_path) -> None
+
+@register_stage_backend('backup', 'copytree')
+def backup_with_copytree(volume, backup_directory_path):
+    shutil.copytree(volume.directory_path, backup_directory_path)
+
+
+@register_stage_backend('backup', 'verified')
+def backup_with_md5(volume, backup_directory_path):
+    # copy and verify md5 of every file, raises ValueError on a mismatch
+    backup_directory(volume.directory_path, backup_directory_path)
+
+
+# ===== ingest_layout: (volume, image_paths_list) -> ingest_directory_path
+
+@register_stage_backend('ingest_layout', 'copy_pages')
+def copy_pages_into_ingest_directory(volume, image_paths_list):
+    '''
+    <directory>_CreatedForIslandoraIngest_YYYY-MM-DD/1/page 1.tif, 2/page 2.tif, etc.
+    next to the volume, the volume itself is left alone
+    '''
+    ingest_directory_name = f'{volume.directory_path.name}_CreatedForIslandoraIngest_{get_todays_date()}'
+    ingest_directory_path = volume.directory_path.parents[0].joinpath(ingest_directory_name)
+    # a sub-directory with a simple index number per page, all journaled in 1 write
+    image_subdirectory_paths_list = [ingest_directory_path.joinpath(str(index))
+                                     for index in range(1, len(image_paths_list) + 1)]
+    created_list = volume.journal.mkdir_all([ingest_directory_path] + image_subdirectory_paths_list,
+                                            exist_ok=True)
+    if not created_list[0]:  # directory already exists
+        print(f'WARNING: ingest directory already exists at {ingest_directory_path}')
+    for image_subdirectory_path, created in zip(image_subdirectory_paths_list, created_list[1:]):
+        if not created:
+            print(f'Sub-directory already exists at {image_subdirectory_path}')
+
+    for image_path, image_subdirectory_path in zip(image_paths_list, image_subdirectory_paths_list):
+
+        # set new image name and copy path, then copy image
+        new_image_name = f'page {image_subdirectory_path.name}{image_path.suffix}'
+        new_image_path = image_subdirectory_path.joinpath(new_image_name)
+        with default_io_scheduler.transfer(image_path, new_image_path) as transfer:
+            shutil.copyfile(image_path, new_image_path)
+            transfer.add(image_path.stat().st_size)
+        volume.journal.created(new_image_path)
+
+    return ingest_directory_path
+
+
+# POSIX systems can make the page directories and move the pages relative to an
+# open directory, Windows can't
+dir_fd_supported = (os.mkdir in os.supports_dir_fd and os.rename in os.supports_dir_fd and
+                    hasattr(os, 'O_DIRECTORY'))
+
+
+def move_pages_with_dir_fd(ingest_directory_path, image_names_list, journal):
+    '''
+    -- Purpose --
+    Move each image into a 000001/, 000002/, etc. sub-directory, keeping its name,
+    with the ingest directory held open: every mkdir and rename only looks up names
+    inside it instead of resolving the full path on the share again
+
+    -- Arguments --
+    ingest_directory_path: type=Path-like object; directory with the images
+    image_names_list: type=list; image file names in page order
+    journal: type=VolumeJournal; mkdirs and renames are already recorded ahead,
+    see move_pages_into_subdirectories(), only what didn't happen is recorded here
+
+    -- Returns --
+    None
+    '''
+    ingest_directory_fd = os.open(ingest_directory_path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        for index, image_name in enumerate(image_names_list, start=1):
+            image_subdirectory_name = str(index).zfill(6)
+            image_subdirectory_path = os.path.join(ingest_directory_path, image_subdirectory_name)
+            try:
+                os.mkdir(image_subdirectory_name, dir_fd=ingest_directory_fd)
+            except FileExistsError:
+                print(f'Sub-directory already exists at {image_subdirectory_path}')
+                journal.record('cancel', image_subdirectory_path)
+            # POSIX rename replaces an existing file, like Path.replace
+            try:
+                os.rename(image_name, f'{image_subdirectory_name}/{image_name}',
+                          src_dir_fd=ingest_directory_fd, dst_dir_fd=ingest_directory_fd)
+            except BaseException:
+                journal.record('cancel', os.path.join(ingest_directory_path, image_name),
+                               os.path.join(image_subdirectory_path, image_name))
+                raise
+    finally:
+        os.close(ingest_directory_fd)
+
+
+def move_pages_into_subdirectories(ingest_directory_path, image_names_list, journal):
+    # move each image into a 000001/, 000002/, etc. sub-directory, keeping its name,
+    # with every mkdir and rename journaled in 1 write before the first one
+    if not dir_fd_supported:
+        image_subdirectory_paths_list = [ingest_directory_path.joinpath(str(index).zfill(6))
+                                         for index in range(1, len(image_names_list) + 1)]
+        created_list = journal.mkdir_all(image_subdirectory_paths_list, exist_ok=True)
+        for image_subdirectory_path, created in zip(image_subdirectory_paths_list, created_list):
+            if not created:
+                print(f'Sub-directory already exists at {image_subdirectory_path}')
+        journal.rename_all([(ingest_directory_path.joinpath(image_name), image_subdirectory_path.joinpath(image_name))
+                            for image_name, image_subdirectory_path in zip(image_names_list,
+                                                                           image_subdirectory_paths_list)])
+        return
+
+    for index, image_name in enumerate(image_names_list, start=1):
+        image_subdirectory_path = os.path.join(ingest_directory_path, str(index).zfill(6))
+        journal.record('mkdir', image_subdirectory_path)
+        journal.record('rename', os.path.join(ingest_directory_path, image_name),
+                       os.path.join(image_subdirectory_path, image_name))
+    journal.flush()
+    try:
+        move_pages_with_dir_fd(ingest_directory_path, image_names_list, journal)
+    finally:
+        journal.flush()
+
+
+@register_stage_backend('ingest_layout', 'move_pages')
+def move_pages_into_ingest_directory(volume, image_paths_list):
+    '''
+    Rename the volume to <directory>_ForIslandoraIngest_Created_YYYY-MM-DD and move
+    its images into 000001/, 000002/, etc. -- no image data is copied
+    '''
+    ingest_directory_name = f'{volume.directory_path.name}_ForIslandoraIngest_Created_{get_todays_date()}'
+    ingest_directory_path = volume.directory_path.parents[0].joinpath(ingest_directory_name)
+
+    volume.journal.rename(volume.directory_path, ingest_directory_path)
+    move_pages_into_subdirectories(ingest_directory_path, [x.name for x in image_paths_list], volume.journal)
+
+    return ingest_directory_path
+
+
+@register_stage_backend('ingest_layout', 'move_pages_in_place')
+def move_pages_into_volume_directory(volume, image_paths_list):
+    '''
+    Move the volume's images into 000001/, 000002/, etc. inside the volume directory,
+    which keeps its name
+    '''
+    for index, image_path in enumerate(image_paths_list, start=1):
+        # images are renamed <DIRECTORY>_0001.tif first, so the numbers must line up
+        if get_page_number(image_path.name) != index:
+            raise ValueError(f'{image_path.name} is out of order for page {index}')
+
+    move_pages_into_subdirectories(volume.directory_path, [x.name for x in image_paths_list], volume.journal)
+
+    return volume.directory_path
+
+
+# ===== package: (volume, ingest_directory_path) -> packaged path
+
+@register_stage_backend('package', 'zip')
+def package_as_zip(volume, ingest_directory_path):
+    # <directory>.zip next to the volume with the contents of the ingest directory
+    with default_io_scheduler.transfer(ingest_directory_path, volume.directory_path.parents[0]) as transfer:
+        zip_path = shutil.make_archive(str(volume.directory_path), 'zip', root_dir=ingest_directory_path)
+        transfer.add(os.path.getsize(zip_path))
+    volume.journal.created(zip_path)
+    return zip_path
+
+
+@register_stage_backend('package', 'book_directory')
+def package_into_book_directory(volume, ingest_directory_path):
+    # Islandora book batch ingest expects the ingest directories inside "book"
+    book_directory_path = ingest_directory_path.parents[0].joinpath('book')
+    volume.journal.mkdir(book_directory_path, exist_ok=True)
+
+    final_path = book_directory_path.joinpath(ingest_directory_path.name)
+    volume.journal.rename(ingest_directory_path, final_path)
+
+    number_of_books = len([x for x in book_directory_path.iterdir() if x.is_dir()])
+    print(f'{number_of_books} books in {book_directory_path} for ingest')
+    print('')
+
+    return final_path
+
+
+@register_stage_backend('package', 'multipage_tiff')
+def package_as_multipage_tiff(volume, ingest_directory_path):
+    # <directory>.tif next to the volume with every page of the ingest directory copied
+    # in without re-encoding, split_multipage_tiff() puts the pages back
+    multipage_path = volume.directory_path.parents[0].joinpath(f'{volume.directory_path.name}.tif')
+    assemble_multipage_tiff(get_ingest_page_paths(ingest_directory_path), multipage_path)
+    volume.journal.created(multipage_path)
+    return multipage_path
@@ -0,0 +1,420 @@
+import shutil
+from pathlib import Path
+
+from utk_ContinuingPublications.common import get_formatted_extension
+from utk_ContinuingPublications.image_qa import qa_pages
+from utk_ContinuingPublications.journal import VolumeJournal, restore_volume
+from utk_ContinuingPublications.mods import create_mods
+from utk_ContinuingPublications.page_index import get_page_index, get_page_index_problems, sort_pages
+from utk_ContinuingPublications.pdf_check import check_volume_pdfs
+from utk_ContinuingPublications.stages import get_stage_backend, stage_backends_dict
+
+
+class ContinuingPublications_Volume:
+    '''
+    Common base class for Continuing Publications
+
+    Each pipeline stage (rename, backup, ingest_layout, package) is done by a
+    backend from stages.py. Pass backend names as keyword arguments to pick
+    different engines for 1 volume, e.g.
+    ContinuingPublications_Volume(path, rename='directory_name_upper', package='book_directory')
+    '''
+
+    # volumes are created by the ten-thousand for inventory and planning, so keep
+    # them small and don't touch the filesystem until a path is needed
+    __slots__ = ('directory', '_directory_path', 'backends_dict', '_journal')
+
+    # stage -> backend name, subclasses and entry points override these
+    default_backends_dict = {'rename': 'directory_name',
+                             'backup': 'verified',
+                             'ingest_layout': 'copy_pages',
+                             'package': 'zip'}
+
+    def __init__(self, directory, **backends):
+        unknown_stages_list = [stage for stage in backends if stage not in stage_backends_dict]
+        if unknown_stages_list:
+            raise ValueError(f'Unknown stages {unknown_stages_list}, expected some of {sorted(stage_backends_dict)}')
+
+        self.directory = directory
+        self._directory_path = None
+        self.backends_dict = dict(self.default_backends_dict, **backends)
+        self._journal = None
+
+    @property
+    def directory_path(self):
+        # resolve() is a chain of syscalls on network drives, only do it once
+        if self._directory_path is None:
+            self._directory_path = Path(self.directory).resolve()
+        return self._directory_path
+
+    @property
+    def journal(self):
+        # every rename and created file is recorded here so restore() can undo them
+        if self._journal is None:
+            self._journal = VolumeJournal(self.directory_path)
+        return self._journal
+
+    @property
+    def backup_directory_path(self):
+        return self.directory_path.parents[0].joinpath(f'{self.directory_path.name}_backup')
+
+    @property
+    def qa_report_path(self):
+        # QA report lives next to directory, so it isn't moved with the pages
+        return self.directory_path.parents[0].joinpath(f'{self.directory_path.name}_QA.json')
+
+    @property
+    def yaml_path(self):
+        # yaml lives next to directory
+        return self.directory_path.parents[0].joinpath(f'{self.directory_path.name}.yml')
+
+    def get_backend(self, stage):
+        return get_stage_backend(stage, self.backends_dict[stage])
+
+    def backup_volume(self):
+        '''
+        -- Purpose --
+        Copy all files in directory to backup directory with name: <directory>_backup
+        An existing backup is kept as-is. The backup is made in a hidden temporary
+        directory and only renamed to <directory>_backup once the backend finished,
+        so a failed or unverified copy is never taken for a backup.
+
+        -- Arguments --
+        None
+
+        -- Returns --
+        backup_directory_path: type=Path-like object; returns absolute path to backup directory
+        '''
+        backup_directory_path = self.backup_directory_path
+
+        if backup_directory_path.exists():  # backups require directory to NOT exist
+            print(f'Backup already exists at {backup_directory_path}')
+        else:
+            print(f'Backing up {self.directory_path.name} . . .')
+            partial_backup_directory_path = backup_directory_path.with_name(f'.{backup_directory_path.name}_partial')
+            if partial_backup_directory_path.exists():  # left by a run that was killed
+                shutil.rmtree(partial_backup_directory_path)
+
+            try:
+                self.get_backend('backup')(self, partial_backup_directory_path)
+            except BaseException:
+                shutil.rmtree(partial_backup_directory_path, ignore_errors=True)
+                raise
+            partial_backup_directory_path.rename(backup_directory_path)
+            print('Backup created')
+
+        return backup_directory_path.resolve()
+
+    def remove_backup(self):
+        '''
+        -- Purpose --
+        Deletes the backup volume created by self.backup_volume()
+
+        -- Arguments --
+        None
+
+        -- Returns --
+        True/False: type=boolean; True/False result of _backup.is_dir()
+        '''
+        backup_directory_path = self.backup_directory_path
+
+        # remove backup directory
+        shutil.rmtree(backup_directory_path)
+
+        return backup_directory_path.is_dir()
+
+    def restore(self, run_id=None):
+        '''
+        -- Purpose --
+        Undo what processing changed using the volume's journal: files and directories
+        are renamed back and anything created is deleted, nothing is copied
+
+        -- Arguments --
+        run_id: type=string; only undo this run, None to undo every run
+
+        -- Returns --
+        number_of_operations: type=integer; number of operations undone
+        '''
+        self.journal.close()
+        if not self.journal.journal_path.is_file():
+            print(f'Nothing to restore for {self.directory_path.name}')
+            return 0
+        return restore_volume(self.journal.journal_path, run_id)
+
+    def undo_backup(self):
+        '''
+        -- Purpose --
+        Deletes the processed directory and renames the backup directory to the
+        original directory name. restore() does the same without deleting and
+        re-copying the volume
+
+        -- Arguments --
+        None
+
+        -- Returns --
+        None
+        '''
+        # remove processed directory
+        shutil.rmtree(self.directory_path)
+
+        # rename backup directory to original directory name
+        self.backup_directory_path.rename(self.directory_path)
+
+    def get_file_paths(self, with_extension, delete_dot_files=False):
+        '''
+        -- Purpose --
+        Get all file Paths with_extension in self.directory_path, skipping dot files
+        such as macOS ._ files
+
+        -- Arguments --
+        with_extension: type=string; extension to use for globbing
+        delete_dot_files: type=boolean; delete files that end with_extension, but start with a '.'
+
+        -- Returns --
+        file_paths_list: type:list; list of Path-like objects, 1 Path-like object
+        per file_path in self.directory_path, in page order (page_2 before page_10)
+        '''
+        formatted_extension = get_formatted_extension(with_extension)
+
+        file_paths_list = []
+        dot_file_paths_list = []
+        for file_path in sort_pages(self.directory_path.glob(f'*{formatted_extension}')):
+            if file_path.name.startswith('.'):
+                dot_file_paths_list.append(file_path)
+            else:
+                file_paths_list.append(file_path)
+
+        if delete_dot_files and dot_file_paths_list:
+            print(f'Deleting {len(dot_file_paths_list)} dot files with extension "{with_extension}"')
+            for dot_file_path in dot_file_paths_list:
+                dot_file_path.unlink()
+
+        return file_paths_list
+
+    def rename_files_to_directory_name(self, with_extension, zerofill=4, strict=True):
+        '''
+        -- Purpose --
+        Back up the volume, then rename all files {with_extension} in page order with
+        the rename backend, by default to {self.directory_path.name}_{str(index).zfill(zerofill)}
+        *Note: will currently remediate extensions to lower-case and change tiff/jpeg to tif/jpg
+
+        -- Arguments --
+        with_extension: type=string; extension to rename
+        zerofill: type=integer; how many digits to zeropad
+        strict: type=boolean; raise ValueError before backing up or renaming anything
+        if the page numbers in the file names have gaps or duplicates
+
+        -- Returns --
+        count: type=integer; number of files renamed
+        '''
+        formatted_extension = get_formatted_extension(with_extension)
+
+        # extension will be lower-case and tif/jpg instead of tiff/jpeg
+        remediated_extension = get_formatted_extension(with_extension, remediate=True)
+
+        # get total number of files and the paths for files to rename
+        file_paths_list = self.get_file_paths(formatted_extension)
+        number_of_files = len(file_paths_list)
+
+        print(f'{number_of_files} with {formatted_extension}')
+
+        if number_of_files == 0:
+            return 0
+
+        # check the page sequence before anything is renamed, the names are the
+        # only record of page order
+        page_index_dict = get_page_index(file_paths_list)
+        problems_list = get_page_index_problems(page_index_dict)
+        for problem in problems_list:
+            print(f'WARNING: {self.directory_path.name} {problem}')
+        if problems_list and strict:
+            raise ValueError(f'Pages in {self.directory_path.name} are out of sequence, fix them and re-run')
+
+        self.backup_volume()
+
+        print(f'Renaming {number_of_files} "{formatted_extension}"s in {self.directory_path.name} . . .')
+
+        count = self.get_backend('rename')(self, page_index_dict['paths_list'], remediated_extension, zerofill)
+
+        print(f' Renamed {count} "{formatted_extension}"s')
+        print('')
+
+        return count
+
+    def rename_PDFs_for_ingest(self, strict=True, workers=None):
+        '''
+        -- Purpose --
+        Check the PDFs against the TIFFs, then rename PDFs with stems ending in
+        original, edited, or processed to ORIGINAL.pdf, ORIGINAL_EDITED.pdf, or PROCESSED.pdf
+        Each PDF is opened once, see pdf_check.check_volume_pdfs() for what gets flagged
+
+        -- Arguments --
+        strict: type=boolean; raise ValueError before renaming anything if a PDF is
+        flagged, otherwise only the flagged PDFs are left alone
+        workers: type=integer; number of PDFs opened at once, defaults to os.cpu_count()
+
+        -- Returns --
+        pdf_paths_list: type=list; Path-like objects of the PDFs after renaming
+        '''
+        pdf_paths_list = self.get_file_paths('.pdf')
+
+        number_of_pdfs = len(pdf_paths_list)
+        if number_of_pdfs == 0:
+            print(f'{number_of_pdfs} PDFs to process')
+            return pdf_paths_list
+
+        # cross-check page counts against the TIFFs, unless there aren't any yet
+        number_of_tiffs = len(self.get_file_paths('tif')) or None
+        pdf_info_dicts_list = check_volume_pdfs(pdf_paths_list, number_of_tiffs, workers=workers)
+
+        flagged_pdf_info_dicts_list = [x for x in pdf_info_dicts_list if x['problems_list']]
+        for pdf_info_dict in flagged_pdf_info_dicts_list:
+            print(f"FLAGGED {pdf_info_dict['path'].name}: {', '.join(pdf_info_dict['problems_list'])}")
+        if flagged_pdf_info_dicts_list and strict:
+            raise ValueError(f'{len(flagged_pdf_info_dicts_list)} PDFs in {self.directory_path.name} '
+                             f'need to be remediated before ingest')
+
+        for pdf_info_dict in pdf_info_dicts_list:
+            pdf_path = pdf_info_dict['path']
+            if pdf_info_dict['problems_list']:  # flagged above
+                continue
+            if pdf_info_dict['ingest_name'] is None:  # don't rename
+                print(f'{pdf_path} is not original, original_edited, or processed, manually remediate')
+                print('')
+                continue
+            # rename PDF
+            new_pdf_path = pdf_path.parents[0].joinpath(pdf_info_dict['ingest_name'])
+            print(f"Renaming {pdf_path.name} to {new_pdf_path} ({pdf_info_dict['number_of_pages']} pages)")
+            print('')
+            self.journal.rename(pdf_path, new_pdf_path)
+
+        return self.get_file_paths('.pdf')
+
+    def create_islandora_ingest_directory(self, qa=True):
+        '''
+        -- Purpose --
+        Check the images, then create Islandora ingest directory with TIFF in nested
+        structure using the ingest_layout backend
+
+        -- Arguments --
+        qa: type=boolean; check every page first and raise ValueError without
+        creating anything if a page fails, see image_qa.get_qa_report()
+
+        -- Returns --
+        ingest_directory_path: type=Path-like object; Path to the directory for ingest
+        '''
+        # get image paths and number of images
+        image_paths_list = self.get_file_paths('tif')
+        number_of_images = len(image_paths_list)
+
+        if qa:
+            report_dict = qa_pages(image_paths_list, self.qa_report_path)
+            self.journal.created(self.qa_report_path)
+            if report_dict['failures_list']:
+                raise ValueError(f"{len(report_dict['failures_list'])} pages in {self.directory_path.name} "
+                                 f'failed QA, see {self.qa_report_path}')
+
+        print(f'Processing {number_of_images} images in {self.directory_path.name}')
+
+        ingest_directory_path = self.get_backend('ingest_layout')(self, image_paths_list)
+        self.journal.flush()  # 1 write to the share per stage
+
+        print(f'Ingest directory created at {ingest_directory_path}')
+        print('')
+
+        return ingest_directory_path
+
+    def package_ingest_directory(self, ingest_directory_path):
+        '''
+        -- Purpose --
+        Package an ingest directory with the package backend, e.g. a Zip file, the
+        Islandora "book" directory, or a multi-page TIFF of the pages
+
+        -- Arguments --
+        ingest_directory_path: type=Path-like object; directory from create_islandora_ingest_directory
+
+        -- Returns --
+        packaged_path: type=Path-like object; Zip file, final ingest directory, or
+        multi-page TIFF
+        '''
+        packaged_path = Path(self.get_backend('package')(self, Path(ingest_directory_path)))
+        self.journal.flush()
+        return packaged_path
+
+    def create_zip_file(self, directory_to_zip):
+        '''
+        -- Purpose --
+        Create a zip file from directory_path
+        To be used with create_islandora_ingest_directory
+
+        -- Arguments --
+        directory_path: type=Path-like object; directory to compress into a Zip file
+
+        -- Returns --
+        zip_path: type=Path-like object; {self.directory_path.name}.zip in
+        {self.directory_path.parents[0]}
+        '''
+        return Path(get_stage_backend('package', 'zip')(self, Path(directory_to_zip)))
+
+    def create_yaml(self):
+        '''
+        -- Purpose --
+        Write self.yaml_rows_list to <directory>.yml next to the directory
+
+        -- Arguments --
+        None
+
+        -- Returns --
+        yaml_path: type=Path-like object; Path to the YAML file
+
+        Raises FileExistsError if the YAML file already exists
+        '''
+        if self.yaml_path.is_file():
+            print(f'{self.yaml_path} already exists')
+            raise FileExistsError(self.yaml_path)
+
+        print(f'Creating {self.yaml_path}')
+        with open(self.yaml_path, 'a+') as yml_file:
+            for yaml_row in self.yaml_rows_list:
+                yml_file.write(f'{yaml_row}\n')  # add line break
+                print(yaml_row)
+        self.journal.created(self.yaml_path)
+        self.journal.flush()
+
+        return self.yaml_path
+
+    def process_publication(self):
+        '''
+        -- Purpose --
+        Rename TIFFs, create the ingest directory and YAML file, package it, then
+        move the YAML file next to the packaged ingest directory and create MODS.xml
+
+        -- Arguments --
+        None
+
+        -- Returns --
+        final_path: type=Path-like object; packaged ingest directory
+        '''
+        # rename files
+        self.rename_files_to_directory_name('.tiff')  # process .tiff first just in case
+        self.rename_files_to_directory_name('.tif')  # then make sure it's all .tif
+        self.rename_PDFs_for_ingest()
+
+        # create ingest directory (pages are checked first), then the YAML file
+        ingest_directory_path = self.create_islandora_ingest_directory()
+        yaml_path = self.create_yaml()
+
+        # e.g. move the ingest directory into the Islandora-required book directory
+        final_path = self.package_ingest_directory(ingest_directory_path)
+
+        # move YAML file next to the ingest directory
+        new_yaml_path = final_path.parents[0].joinpath(yaml_path.name)
+        self.journal.rename(yaml_path, new_yaml_path)
+
+        # create MODS.xml in the ingest directory from the YAML file
+        if final_path.is_dir():
+            self.journal.created(create_mods(new_yaml_path, final_path))
+
+        self.journal.close()
+
+        return final_path
@@ -0,0 +1,274 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from utk_ContinuingPublications.workqueue import WorkQueue, get_volume_paths
+
+try:  # Linux only, polling is used everywhere else
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
+
+if inotify_simple is not None:
+    # anything that means a scanner or operator is still writing to a volume
+    inotify_mask = (inotify_simple.flags.CREATE | inotify_simple.flags.MODIFY |
+                    inotify_simple.flags.CLOSE_WRITE | inotify_simple.flags.MOVED_TO |
+                    inotify_simple.flags.MOVED_FROM | inotify_simple.flags.DELETE |
+                    inotify_simple.flags.ATTRIB)
+
+
+def get_volume_signature(volume_path):
+    '''
+    -- Purpose --
+    Summarize everything under volume_path so 2 polls can be compared
+
+    -- Arguments --
+    volume_path: type=Path-like object; volume directory
+
+    -- Returns --
+    signature: type=tuple; (number of files, total bytes, latest modification time)
+    '''
+    number_of_files = 0
+    total_bytes = 0
+    latest_mtime = 0
+
+    directory_paths_list = [str(volume_path)]
+    while directory_paths_list:
+        with os.scandir(directory_paths_list.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    directory_paths_list.append(entry.path)
+                    continue
+                entry_stat = entry.stat(follow_symlinks=False)
+                number_of_files += 1
+                total_bytes += entry_stat.st_size
+                latest_mtime = max(latest_mtime, entry_stat.st_mtime)
+
+    return (number_of_files, total_bytes, latest_mtime)
+
+
+class VolumeWatcher:
+    '''
+    Watch a root directory such as toProcessForUpload and run process_function on
+    each volume directory once nothing in it has changed for quiet_seconds
+
+    On Linux with inotify_simple installed, file events mark a volume as busy, so
+    the volumes don't have to be re-scanned. Otherwise every volume is scanned every
+    poll_seconds and its get_volume_signature() must stay the same for quiet_seconds.
+    Use polling (use_inotify=False) for SMB/NFS shares, inotify doesn't see changes
+    made by other computers.
+
+    Volumes are claimed through a WorkQueue, so several watchers and the batch
+    script can share 1 root directory. At most workers volumes are processed at once.
+    '''
+
+    def __init__(self, root_directory, process_function, quiet_seconds=300, poll_seconds=30, workers=2,
+                 use_inotify=None):
+        self.root_directory_path = Path(root_directory)
+        self.process_function = process_function
+        self.quiet_seconds = quiet_seconds
+        self.poll_seconds = poll_seconds
+        self.workers = workers
+        self.work_queue = WorkQueue(self.root_directory_path)
+
+        if use_inotify is None:
+            use_inotify = inotify_simple is not None and sys.platform.startswith('linux')
+        if use_inotify and inotify_simple is None:
+            raise RuntimeError('Install inotify_simple to watch with inotify')
+        self.inotify = inotify_simple.INotify() if use_inotify else None
+        # inotify watch descriptor -> (volume name, directory), volume name is None for the root directory
+        self.watched_directories_dict = {}
+
+        # volume name -> {'path', 'signature', 'changed'}, changed is time.monotonic() of the last change
+        self.volumes_dict = {}
+        # volume name -> future of volumes being processed
+        self.futures_dict = {}
+        # volume name -> signature when processing failed, retried once the volume changes
+        self.failed_volumes_dict = {}
+
+    def add_watches(self, directory_path, volume_name):
+        # watch directory_path and every directory below it
+        for sub_directory, _, _ in os.walk(directory_path):
+            try:
+                watch_descriptor = self.inotify.add_watch(sub_directory, inotify_mask)
+            except OSError:  # removed while walking
+                continue
+            self.watched_directories_dict[watch_descriptor] = (volume_name, sub_directory)
+
+    def read_events(self, timeout_seconds):
+        '''
+        -- Purpose --
+        Wait up to timeout_seconds for inotify events and mark the volumes they
+        belong to as changed
+
+        -- Arguments --
+        timeout_seconds: type=number; how long to block
+
+        -- Returns --
+        None
+        '''
+        # read_delay gathers a burst of events from a scanner into 1 read
+        events_list = self.inotify.read(timeout=int(timeout_seconds * 1000), read_delay=1000)
+        now = time.monotonic()
+        for event in events_list:
+            volume_name, directory = self.watched_directories_dict.get(event.wd, (None, None))
+            if volume_name is None:  # root directory or a removed watch, new volumes are picked up by scan()
+                continue
+            if volume_name in self.volumes_dict:
+                self.volumes_dict[volume_name]['changed'] = now
+            # keep watching new sub-directories, e.g. the 000001/ page directories
+            if event.mask & inotify_simple.flags.ISDIR and \
+                    event.mask & (inotify_simple.flags.CREATE | inotify_simple.flags.MOVED_TO):
+                self.add_watches(os.path.join(directory, event.name), volume_name)
+
+    def scan(self):
+        '''
+        -- Purpose --
+        Pick up new volumes, forget removed ones, and (when polling) compare each
+        volume's signature with the last poll
+
+        -- Arguments --
+        None
+
+        -- Returns --
+        None
+        '''
+        now = time.monotonic()
+        volume_paths_list = get_volume_paths(self.root_directory_path)
+        volume_names_list = [x.name for x in volume_paths_list]
+
+        # processed volumes are renamed or moved into "book"
+        for volume_name in list(self.volumes_dict):
+            if volume_name not in volume_names_list:
+                del self.volumes_dict[volume_name]
+                self.failed_volumes_dict.pop(volume_name, None)
+
+        for volume_path in volume_paths_list:
+            volume_name = volume_path.name
+            if self.work_queue.is_done(volume_name) or volume_name in self.futures_dict:
+                continue
+
+            if volume_name not in self.volumes_dict:
+                print(f'Watching {volume_name}')
+                self.volumes_dict[volume_name] = {'path': volume_path, 'signature': None, 'changed': now}
+                if self.inotify is not None:
+                    self.add_watches(volume_path, volume_name)
+                else:
+                    try:
+                        self.volumes_dict[volume_name]['signature'] = get_volume_signature(volume_path)
+                    except FileNotFoundError:  # moved while scanning, picked up on the next scan
+                        del self.volumes_dict[volume_name]
+                continue
+
+            if self.inotify is None:
+                try:
+                    signature = get_volume_signature(volume_path)
+                except FileNotFoundError:  # moved while scanning
+                    continue
+                if signature != self.volumes_dict[volume_name]['signature']:
+                    self.volumes_dict[volume_name]['signature'] = signature
+                    self.volumes_dict[volume_name]['changed'] = now
+
+    def get_quiet_volume_paths(self):
+        '''
+        -- Purpose --
+        Get the volumes that haven't changed for self.quiet_seconds and aren't being
+        processed or waiting on a fix after a failure
+
+        -- Arguments --
+        None
+
+        -- Returns --
+        volume_paths_list: type=list; Path-like objects of volumes ready to process
+        '''
+        now = time.monotonic()
+        volume_paths_list = []
+        for volume_name, volume_dict in sorted(self.volumes_dict.items()):
+            if volume_name in self.futures_dict:
+                continue
+            if (now - volume_dict['changed']) < self.quiet_seconds:
+                continue
+            if volume_name in self.failed_volumes_dict:
+                # only retry a failed volume after someone has changed it
+                try:
+                    signature = get_volume_signature(volume_dict['path'])
+                except FileNotFoundError:  # deleted or moved since the scan, skip it until the next one
+                    continue
+                if signature == self.failed_volumes_dict[volume_name]:
+                    continue
+                del self.failed_volumes_dict[volume_name]
+            volume_paths_list.append(volume_dict['path'])
+        return volume_paths_list
+
+    def process_volume(self, volume_path):
+        # runs in a worker thread, the claim keeps other watchers off this volume
+        for claimed_volume_path in self.work_queue.claimed_volumes([volume_path]):
+            self.process_function(claimed_volume_path)
+
+    def collect_finished(self):
+        # report volumes that finished since the last loop
+        for volume_name, future in list(self.futures_dict.items()):
+            if not future.done():
+                continue
+            del self.futures_dict[volume_name]
+            error = future.exception()
+            if error is None:
+                print(f'Finished {volume_name}')
+                self.volumes_dict.pop(volume_name, None)
+                continue
+            print(f'ERROR processing {volume_name}: {type(error).__name__}: {error}')
+            volume_dict = self.volumes_dict.get(volume_name)
+            if volume_dict is not None and volume_dict['path'].is_dir():
+                try:
+                    self.failed_volumes_dict[volume_name] = get_volume_signature(volume_dict['path'])
+                except FileNotFoundError:  # moved after failing, the next scan drops it
+                    pass
+
+    def run(self, stop_event=None):
+        '''
+        -- Purpose --
+        Watch until stop_event is set or Ctrl+C, then wait for running volumes to finish
+
+        -- Arguments --
+        stop_event: type=threading.Event; optional, set it to stop watching
+
+        -- Returns --
+        None
+        '''
+        if stop_event is None:
+            stop_event = threading.Event()
+
+        mode = 'inotify' if self.inotify is not None else f'polling every {self.poll_seconds} seconds'
+        print(f'Watching {self.root_directory_path} ({mode}), volumes are processed after '
+              f'{self.quiet_seconds} quiet seconds with {self.workers} workers')
+
+        if self.inotify is not None:
+            # new volume directories show up as events on the root directory
+            root_watch_descriptor = self.inotify.add_watch(str(self.root_directory_path), inotify_mask)
+            self.watched_directories_dict[root_watch_descriptor] = (None, str(self.root_directory_path))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            try:
+                while not stop_event.is_set():
+                    self.scan()
+                    self.collect_finished()
+
+                    for volume_path in self.get_quiet_volume_paths():
+                        if len(self.futures_dict) >= self.workers:  # bounded, the rest wait for the next loop
+                            break
+                        print(f'{volume_path.name} is quiet, processing')
+                        self.futures_dict[volume_path.name] = executor.submit(self.process_volume, volume_path)
+
+                    if self.inotify is not None:
+                        self.read_events(self.poll_seconds)
+                    else:
+                        stop_event.wait(self.poll_seconds)
+            except KeyboardInterrupt:
+                print('Stopping, waiting for volumes being processed . . .')
+
+        self.collect_finished()
+        if self.inotify is not None:
+            self.inotify.close()
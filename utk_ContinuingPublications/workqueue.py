@@ -0,0 +1,289 @@
+import datetime
+import json
+import os
+import socket
+import threading
+import time
+from pathlib import Path
+
+# claim files are kept in a hidden directory inside the root directory so every
+# workstation mounting the share sees the same queue
+queue_directory_name = '.work_queue'
+
+# directories in the root directory that are created by processing, not volumes
+skip_directory_names = ['book']
+skip_directory_suffixes = ['_backup']
+# ingest directories made by the ingest_layout stages, e.g. a volume renamed by
+# move_pages stays in the root directory until it's packaged, or if the run fails
+skip_directory_infixes = ['_ForIslandoraIngest_Created_', '_CreatedForIslandoraIngest_']
+
+
+def get_volume_paths(root_directory):
+    '''
+    -- Purpose --
+    Get the sorted volume directories in root_directory, skipping hidden directories,
+    the Islandora "book" directory, <directory>_backup directories, and ingest
+    directories that are still in root_directory
+
+    -- Arguments --
+    root_directory: type=Path-like object; directory with 1 sub-directory per volume
+
+    -- Returns --
+    volume_paths_list: type=list; sorted list of Path-like objects, 1 per volume
+    '''
+    volume_paths_list = []
+    for directory_path in sorted(Path(root_directory).iterdir()):
+        if not directory_path.is_dir():
+            continue
+        if directory_path.name.startswith('.'):
+            continue
+        if directory_path.name in skip_directory_names:
+            continue
+        if directory_path.name.endswith(tuple(skip_directory_suffixes)):
+            continue
+        if any(x in directory_path.name for x in skip_directory_infixes):
+            continue
+        volume_paths_list.append(directory_path)
+    return volume_paths_list
+
+
+def rename_without_replacing(source_path, destination_path):
+    '''
+    -- Purpose --
+    Rename source_path to destination_path, raising FileExistsError instead of
+    replacing destination_path if it exists
+
+    -- Arguments --
+    source_path: type=Path-like object; file to rename
+    destination_path: type=Path-like object; new name
+
+    -- Returns --
+    None
+    '''
+    if os.name == 'nt':  # Windows rename never replaces
+        os.rename(source_path, destination_path)
+        return
+    os.link(source_path, destination_path)  # raises FileExistsError
+    os.unlink(source_path)
+
+
+def take_over_stale_file(file_path, stale_seconds, worker_id):
+    '''
+    -- Purpose --
+    Remove file_path if it hasn't been touched for stale_seconds, e.g. the claim or
+    lock of a crashed worker. The file is renamed aside first and only deleted if it
+    is still the file that was checked: another worker may have taken over the
+    stale file and made a fresh one between the check and the rename, then the
+    fresh file is put back.
+
+    -- Arguments --
+    file_path: type=Path-like object; claim or lock file
+    stale_seconds: type=number; age of a stale file
+    worker_id: type=string; this worker, used to name the renamed file
+
+    -- Returns --
+    True/False: type=boolean; True if a stale file was removed
+    '''
+    file_path = Path(file_path)
+    try:
+        checked_stat = file_path.stat()
+    except FileNotFoundError:  # released while we were looking
+        return False
+    if (time.time() - checked_stat.st_mtime) <= stale_seconds:
+        return False
+
+    # rename is atomic so only 1 worker moves any given file
+    stale_path = file_path.with_name(f'{file_path.name}.stale-{worker_id}')
+    try:
+        file_path.rename(stale_path)
+    except OSError:  # another worker took it over first
+        return False
+
+    moved_stat = stale_path.stat()
+    if (moved_stat.st_ino, moved_stat.st_mtime) != (checked_stat.st_ino, checked_stat.st_mtime):
+        # moved another worker's fresh file, give it back
+        try:
+            rename_without_replacing(stale_path, file_path)
+        except FileExistsError:
+            print(f'WARNING: {file_path.name} was taken over twice, removing the copy moved aside')
+            stale_path.unlink()
+        return False
+
+    stale_path.unlink()
+    return True
+
+
+class WorkQueue:
+    '''
+    File-based work queue so several workstations can process disjoint volumes
+    in the same root directory
+
+    A volume is claimed by exclusively creating <queue_directory>/<volume>.claim,
+    which works on local disks and SMB/NFS shares alike. While a volume is being
+    processed the claim file is touched every heartbeat_seconds; a claim that has
+    not been touched for stale_seconds is considered abandoned (crashed worker,
+    closed laptop) and can be taken over by another worker. Finished volumes get
+    a <volume>.done marker so they are never handed out again.
+    '''
+
+    def __init__(self, root_directory, stale_seconds=600, heartbeat_seconds=60, worker_id=None):
+        self.root_directory_path = Path(root_directory)
+        self.queue_directory_path = self.root_directory_path.joinpath(queue_directory_name)
+        self.queue_directory_path.mkdir(exist_ok=True)
+        self.stale_seconds = stale_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        if worker_id is None:
+            worker_id = f'{socket.gethostname()}-{os.getpid()}'
+        self.worker_id = worker_id
+        # volumes that failed in this run, released instead of marked done
+        self.failed_volume_names_list = []
+
+    def get_claim_path(self, volume_name):
+        return self.queue_directory_path.joinpath(f'{volume_name}.claim')
+
+    def get_done_path(self, volume_name):
+        return self.queue_directory_path.joinpath(f'{volume_name}.done')
+
+    def is_done(self, volume_name):
+        return self.get_done_path(volume_name).is_file()
+
+    def claim(self, volume_name):
+        '''
+        -- Purpose --
+        Try to claim volume_name for this worker, recovering a stale claim if needed
+
+        -- Arguments --
+        volume_name: type=string; name of the volume directory
+
+        -- Returns --
+        True/False: type=boolean; True if this worker now owns the volume
+        '''
+        if self.is_done(volume_name):
+            return False
+
+        claim_path = self.get_claim_path(volume_name)
+
+        if take_over_stale_file(claim_path, self.stale_seconds, self.worker_id):
+            print(f'Recovered stale claim on {volume_name}')
+
+        try:
+            file_descriptor = os.open(claim_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:  # claimed by another worker
+            return False
+
+        claim_info = {'worker': self.worker_id,
+                      'claimed': datetime.datetime.now().isoformat(timespec='seconds')}
+        with os.fdopen(file_descriptor, 'w') as claim_file:
+            json.dump(claim_info, claim_file)
+
+        # another worker may have finished the volume between is_done() and the claim
+        if self.is_done(volume_name):
+            self.release(volume_name)
+            return False
+
+        return True
+
+    def release(self, volume_name):
+        '''
+        -- Purpose --
+        Remove this worker's claim on volume_name so another worker can retry it
+
+        -- Arguments --
+        volume_name: type=string; name of the volume directory
+
+        -- Returns --
+        None
+        '''
+        try:
+            self.get_claim_path(volume_name).unlink()
+        except FileNotFoundError:
+            pass
+
+    def mark_failed(self, volume_name):
+        '''
+        -- Purpose --
+        Record that volume_name failed in this worker and release the claim, so
+        claimed_volumes() doesn't mark it done and another run can retry it
+
+        -- Arguments --
+        volume_name: type=string; name of the volume directory
+
+        -- Returns --
+        None
+        '''
+        self.failed_volume_names_list.append(volume_name)
+        self.release(volume_name)
+
+    def mark_done(self, volume_name):
+        '''
+        -- Purpose --
+        Record volume_name as processed and release the claim
+
+        -- Arguments --
+        volume_name: type=string; name of the volume directory
+
+        -- Returns --
+        None
+        '''
+        done_info = {'worker': self.worker_id,
+                     'finished': datetime.datetime.now().isoformat(timespec='seconds')}
+        with open(self.get_done_path(volume_name), 'w') as done_file:
+            json.dump(done_info, done_file)
+        self.release(volume_name)
+
+    def heartbeat(self, volume_name, stop_event):
+        # touch the claim file until stop_event is set, runs in a thread
+        claim_path = self.get_claim_path(volume_name)
+        while not stop_event.wait(self.heartbeat_seconds):
+            try:
+                os.utime(claim_path)
+            except FileNotFoundError:  # claim was recovered by another worker
+                print(f'WARNING: lost claim on {volume_name}')
+                return
+
+    def claimed_volumes(self, volume_paths_list=None):
+        '''
+        -- Purpose --
+        Yield each volume this worker claims, keeping the claim alive while the
+        caller processes it. The volume is marked done when the caller moves on to
+        the next volume; if processing raises, or the caller calls mark_failed(),
+        the claim is released for a retry.
+
+        -- Arguments --
+        volume_paths_list: type=list; optional list of volume Paths, defaults to
+        get_volume_paths(self.root_directory_path)
+
+        -- Returns --
+        generator of Path-like objects, 1 per claimed volume
+        '''
+        if volume_paths_list is None:
+            volume_paths_list = get_volume_paths(self.root_directory_path)
+
+        for volume_path in volume_paths_list:
+            volume_name = volume_path.name
+
+            if not self.claim(volume_name):
+                continue
+
+            # a worker that finished (or crashed mid-way) may have moved the volume
+            if not volume_path.is_dir():
+                print(f'WARNING: {volume_path} no longer exists, skipping')
+                self.release(volume_name)
+                continue
+
+            stop_event = threading.Event()
+            heartbeat_thread = threading.Thread(target=self.heartbeat,
+                                                args=(volume_name, stop_event),
+                                                daemon=True)
+            heartbeat_thread.start()
+            try:
+                yield volume_path
+            except BaseException:
+                self.release(volume_name)
+                raise
+            else:
+                if volume_name not in self.failed_volume_names_list:
+                    self.mark_done(volume_name)
+            finally:
+                stop_event.set()
+                heartbeat_thread.join()
@@ -1,216 +1,108 @@
-import shutil
+import multiprocessing
+import sys
 import tkinter as tk
 from pathlib import Path
 from tkinter.filedialog import askdirectory
 
-def get_formatted_extension(from_extension, remediate=False):
+from utk_ContinuingPublications import ContinuingPublications_Volume
+from utk_ContinuingPublications.derivatives import create_derivatives
+from utk_ContinuingPublications.ocr import ocr_ingest_directory
+from utk_ContinuingPublications.profiling import default_run_profiler
+from utk_ContinuingPublications.watcher import VolumeWatcher
+from utk_ContinuingPublications.journal import current_run_id, rollback_run
+from utk_ContinuingPublications.workqueue import WorkQueue, get_volume_paths
+
+def process_volume(directory_path, with_derivatives=False, with_ocr=False):
     '''
     -- Purpose --
-    Returns an extension that:
-    1. has a period in the front
-    2. Optional: is lower-case
-    3. Optional: return jpeg as jpg and tiff as tif
+    Rename TIFFs and PDFs in directory_path, create the Islandora book ingest
+    directory, and move it into the "book" directory next to directory_path
 
     -- Arguments --
-    from_extension: type=string; file extension with or without a '.'
+    directory_path: type=Path-like object; volume directory to process
+    with_derivatives: type=boolean; pre-generate JP2/JPG/TN for every page so the
+    ingest server can skip its own image conversions
+    with_ocr: type=boolean; create OCR.txt and HOCR.html for every page with Tesseract
 
     -- Returns --
-    formatted_extension: type=string; formatted extension
+    final_path: type=Path-like object; Path to the ingest directory inside "book"
     '''
-    # make sure there's a period at the front of the extension
-    if from_extension.startswith('.'):  # do nothing
-        formatted_extension = from_extension
-    else:  # add a period
-        formatted_extension = f'.{from_extension}'
-
-    # make it lower-case
-    if remediate:
-        formatted_extension = formatted_extension.lower()
-        # hard-coded alterations for jpeg and tiff
-        if formatted_extension == '.jpeg':
-            formatted_extension = '.jpg'
-        elif formatted_extension == '.tiff':
-            formatted_extension = '.tif'
-
-    return formatted_extension
-
-class ContinuingPublications_Volume:
-    '''Common base class for Continuing Publications'''
-
-    def __init__(self, directory):
-        self.directory_path = Path(directory).resolve()
-
-
-    def backup_volume(self):
-        '''
-        -- Purpose --
-        Copy all files in directory to backup directory with name: <directory>_backup
-
-        -- Arguments --
-        None
-
-        -- Returns --
-        backup_directory_path: type=Path-like object; returns absolute path to backup directory
-        '''
-        backup_directory_name = f'{self.directory_path.name}_backup'
-        backup_directory_path = self.directory_path.parents[0].joinpath(backup_directory_name)
-
-        if backup_directory_path.exists():  # shutil.copytree requires directory to NOT exist
-            # shutil.rmtree(backup_directory_path)
-            print(f'Backup already exists at {backup_directory_path}')
-        else:
-            print(f'Backing up {self.directory_path.name} . . .')
-            shutil.copytree(self.directory_path, backup_directory_path)
+    print('')
+    print(f'Directory: {directory_path}')
+    print('')
 
-            if backup_directory_path.exists():
-                print('Backup created')
-        return backup_directory_path.resolve()
+    # create Volume: Adobe Acrobat TIFFs renamed to <DIRECTORY>_0001.tif, the volume
+    # becomes the ingest directory, which is moved into "book"
+    volume = ContinuingPublications_Volume(directory_path,
+                                           rename='directory_name_upper',
+                                           ingest_layout='move_pages',
+                                           package='book_directory')
 
+    # every stage is timed and profiled separately when run with --profile
+    volume_name = Path(directory_path).name
 
-    def create_islandora_ingest_directory(self):
-        '''
-        -- Purpose --
-        Create Islandora ingest directory with TIFF in nested structure
+    try:
+        # rename Adobe Acrobat .tiff files to directory and .tif extension
+        with default_run_profiler.stage(volume_name, 'rename'):
+            volume.rename_files_to_directory_name('.tiff')
+            volume.rename_files_to_directory_name('.tif')
+
+        # rename PDFs for ingest
+        with default_run_profiler.stage(volume_name, 'rename_PDFs'):
+            volume.rename_PDFs_for_ingest()
 
-        -- Arguments --
-        None
+        # create Islanodra book ingest directory
+        with default_run_profiler.stage(volume_name, 'ingest_layout'):
+            ingest_directory_path = volume.create_islandora_ingest_directory()
 
-        -- Returns --
-        ingest_directory_path: type=Path-like object; Path to the directory for ingest
-        '''
-        import datetime
+        if with_derivatives:
+            with default_run_profiler.stage(volume_name, 'derivatives'):
+                create_derivatives(ingest_directory_path, journal=volume.journal)
 
-        # set ingest stub to add to directory name
-        ingest_stub = 'ForIslandoraIngest_Created'
-        # get today's date in YYYY-MM-DD format and add to ingest stub
-        todays_date = datetime.datetime.now().strftime('%Y-%m-%d')
-        ingest_stub = f'{ingest_stub}_{todays_date}'
+        if with_ocr:
+            with default_run_profiler.stage(volume_name, 'ocr'):
+                ocr_ingest_directory(ingest_directory_path, journal=volume.journal)
 
-        # create ingest directory
-        ingest_directory_name = f'{self.directory_path.name}_{ingest_stub}'
-        ingest_directory_path = self.directory_path.parents[0].joinpath(ingest_directory_name)
-        # try:
-        #     ingest_directory_path.mkdir()
-        # except FileExistsError:  # directory already exists
-        #     print(f'WARNING: ingest directory already exists at {ingest_directory_path}')
+        # move ingest directory into the book directory needed for Islandora
+        with default_run_profiler.stage(volume_name, 'package'):
+            final_path = volume.package_ingest_directory(ingest_directory_path)
+    finally:  # a failed volume keeps its journal for --rollback
+        volume.journal.close()
 
-        self.directory_path.replace(ingest_directory_path)
+    return final_path
 
-        image_paths_list = [x for x in ingest_directory_path.glob('*.tif')]
-        number_of_images = len(image_paths_list)
 
-        print(f'Processing {number_of_images} images in {self.directory_path.name}')
+def print_failed_volumes(failed_volumes_list):
+    # summary at the end of a run, so failures don't scroll out of sight
+    if not failed_volumes_list:
+        return
+    print('')
+    print(f'{len(failed_volumes_list)} volume(s) FAILED, fix them and run again or undo with --rollback:')
+    for directory_path, error in failed_volumes_list:
+        print(f' {directory_path.name}: {type(error).__name__}: {error}')
 
-        # for each image
-        for index, image_path in enumerate(image_paths_list, start=1):
-
-            # create a sub-directory with a simple index number
-            image_subdirectory_path = ingest_directory_path.joinpath(str(index).zfill(6))
-            try:
-                image_subdirectory_path.mkdir()
-            except FileExistsError:
-                print(f'Sub-directory already exists at {image_subdirectory_path}')
-
-            # set new image name and copy path, then copy image
-            #copy_image_path = image_subdirectory_path.joinpath(image_path.name)
-            #shutil.copyfile(image_path, copy_image_path)
-            image_path.replace(image_subdirectory_path.joinpath(image_path.name))
-
-        print(f'Ingest directory created at {ingest_directory_path}')
-        print('')
-
-        return ingest_directory_path
-
-
-    def get_file_paths(self, with_extension):
-        '''
-        -- Purpose --
-        Get all file Paths with_extension in self.directory_path
-
-        -- Arguments --
-        with_extension: type=string; extension to use for globbing
-
-        -- Returns --
-        file_paths_list: type:list; list of Path-like objects, 1 Path-like object
-        per file_path in self.directory_path
-        '''
-        formatted_extension = get_formatted_extension(with_extension)
-        file_paths_list = sorted(self.directory_path.glob(f'*{formatted_extension}'))
-        return file_paths_list
-
-
-    def rename_tiffs_to_directory_name(self, with_extension, zerofill=4):
-        '''
-        -- Purpose --
-        Rename all files {with_extension} to {self.directory_path.name}_{str(index).zfill(zerofill)}
-        *Note: will currently remediate extensions to lower-case and change tiff/jpeg to tif/jpg
-
-        -- Arguments --
-        with_extension: type=string; extension to rename
-        zerofill: type=integer; how many digits to zeropad
-
-        -- Returns --
-        None
-        '''
-        formatted_extension = get_formatted_extension(with_extension)
-
-        # extension will be lower-case and tif/jpg instead of tiff/jpeg
-        remediated_extension = get_formatted_extension(with_extension, remediate=True)
-
-        # get total number of files and the paths for files to rename
-        file_paths_list = self.get_file_paths(formatted_extension)
-        number_of_files = len(file_paths_list)
-
-        print(f'{number_of_files} with {formatted_extension}')
-
-        if number_of_files == 0:
-            pass
-
-        else:  # rename files
-            backup_directory_path = self.backup_volume()
-
-            print(f'Renaming {number_of_files} "{formatted_extension}"s in {self.directory_path.name} . . .')
-
-            count = 0
-            try:
-                for index, file_path in enumerate(file_paths_list, start=1):
-                    # rename TIFF files from Adobe Acrobat for Islandora ingest, i.e. FILENAME.extension
-                    new_file_name = f'{self.directory_path.name.upper()}_{str(index).zfill(zerofill)}{remediated_extension}'
-                    new_file_path = file_path.parents[0].joinpath(new_file_name)
-                    file_path.replace(new_file_path)
-                    count = index
-            except IndexError:
-                pass
-
-            print(f' Renamed {count} "{formatted_extension}"s')
-            print('')
-
-
-    def rename_PDFs_for_ingest(self):
-
-        pdf_paths_list = self.get_file_paths('.pdf')
-
-        number_of_pdfs = len(pdf_paths_list)
-        if number_of_pdfs == 0:
-            print(f'{number_of_pdfs} PDFs to process')
-        else:  # process PDFs
-            for pdf_path in pdf_paths_list:
-                # expect PDF stems ending in original or processed
-                if pdf_path.stem.lower().endswith('original'):
-                    new_pdf_path = pdf_path.parents[0].joinpath('ORIGINAL.pdf')
-                elif pdf_path.stem.lower().endswith('processed'):
-                    new_pdf_path = pdf_path.parents[0].joinpath('PROCESSED.pdf')
-                else:  # don't rename
-                    print(f'{pdf_path} is not original or processed, manually remediate')
-                    print('')
-                    continue
-                # rename PDF
-                print(f'Renaming {pdf_path.name} to {new_pdf_path}')
-                print('')
-                pdf_path.replace(new_pdf_path)
 
 if __name__ == "__main__":
 
+    # PyInstaller exes: process pool workers (page QA, derivatives) must not re-run this
+    multiprocessing.freeze_support()
+
+    # run with --queue on each workstation to share the volumes in the root
+    # directory between workers, see utk_ContinuingPublications/workqueue.py
+    use_work_queue = '--queue' in sys.argv[1:]
+    # run with --derivatives to create JP2, JPG, and TN files for every page
+    with_derivatives = '--derivatives' in sys.argv[1:]
+    # run with --ocr to create OCR.txt and HOCR.html for every page
+    with_ocr = '--ocr' in sys.argv[1:]
+    # run with --watch to keep running and process each volume once the scanner
+    # stops writing to it, see utk_ContinuingPublications/watcher.py
+    use_watcher = '--watch' in sys.argv[1:]
+    # run with --rollback to undo the most recent run in the chosen directory
+    use_rollback = '--rollback' in sys.argv[1:]
+    # run with --profile to write a profile of every stage of every volume, see
+    # utk_ContinuingPublications/profiling.py
+    use_profiler = '--profile' in sys.argv[1:]
+
     # get file directory to process
     # https://stackoverflow.com/a/14119223
     root = tk.Tk()
@@ -218,37 +110,45 @@ if __name__ == "__main__":
     root_directory_path = Path(askdirectory())
     root.destroy()  # close tk window
 
-    directory_paths_list = [x for x in root_directory_path.iterdir() if x.is_dir()]
-
-    for directory_path in directory_paths_list:
-        print('')
-        print(f'Directory: {directory_path}')
-        print('')
-
-        # create Volume
-        volume = ContinuingPublications_Volume(directory_path)
-
-        # rename Adobe Acrobat .tiff files to directory and .tif extension
-        volume.rename_tiffs_to_directory_name('.tiff')
-        volume.rename_tiffs_to_directory_name('.tif')
-
-        # rename PDFs for ingest
-        volume.rename_PDFs_for_ingest()
-
-        # create Islanodra book ingest directory
-        ingest_directory_path = volume.create_islandora_ingest_directory()
-
-        # create book directory path as needed for Islandora
-        book_directory_path = volume.directory_path.parents[0].joinpath('book')
-        book_directory_path.mkdir(exist_ok=True)
-
-        # move ingest directory into book directory
-        final_path = book_directory_path.joinpath(ingest_directory_path.name)
-        ingest_directory_path.replace(final_path)
-
-        number_of_books = len([x for x in book_directory_path.iterdir() if x.is_dir()])
-        print(f'{number_of_books} books in {book_directory_path} for ingest')
-        print('')
+    if not use_rollback:
+        print(f'Run {current_run_id}, undo it with --rollback')
+    if use_profiler:
+        default_run_profiler.start()
+
+    try:
+        if use_rollback:
+            rollback_run(root_directory_path)
+        elif use_watcher:
+            volume_watcher = VolumeWatcher(root_directory_path,
+                                           lambda x: process_volume(x, with_derivatives, with_ocr))
+            volume_watcher.run()  # Ctrl+C to stop
+        elif use_work_queue:
+            work_queue = WorkQueue(root_directory_path)
+            print(f'Worker {work_queue.worker_id} claiming volumes in {root_directory_path}')
+            failed_volumes_list = []
+            for directory_path in work_queue.claimed_volumes():
+                try:
+                    process_volume(directory_path, with_derivatives, with_ocr)
+                except Exception as error:  # e.g. ValueError from the page and PDF checks
+                    print(f'FAILED: {directory_path.name}: {type(error).__name__}: {error}')
+                    failed_volumes_list.append((directory_path, error))
+                    # another worker, or the next run, can retry it
+                    work_queue.mark_failed(directory_path.name)
+            print_failed_volumes(failed_volumes_list)
+        else:
+            # skips backups, "book", and hidden directories like .volume_journals
+            directory_paths_list = get_volume_paths(root_directory_path)
+
+            failed_volumes_list = []
+            for directory_path in directory_paths_list:
+                try:
+                    process_volume(directory_path, with_derivatives, with_ocr)
+                except Exception as error:  # e.g. ValueError from the page and PDF checks
+                    print(f'FAILED: {directory_path.name}: {type(error).__name__}: {error}')
+                    failed_volumes_list.append((directory_path, error))
+            print_failed_volumes(failed_volumes_list)
+    finally:  # keep the profile of a run that crashed or was stopped, e.g. Ctrl+C
+        default_run_profiler.finish()
 
     # keep command window open after running PyInstaller
     print('Press Enter key to close window')
@@ -1,10 +1,14 @@
 # importing & options
 import datetime
+import multiprocessing
 import shutil
+import sys
 import tkinter as tk
 from pathlib import Path
 from tkinter.filedialog import askdirectory
 
+from utk_ContinuingPublications.profiling import default_run_profiler
+
 def rename_files_to_directory_name(directory, zfill=4, file_extension='.tif'):
 
     '''
@@ -100,6 +104,14 @@ def create_subdirectories_for_ingest(book_directory, file_extension='.tif'):
 
 if __name__ == "__main__":
 
+    # PyInstaller exes: process pool workers (page QA, derivatives) must not re-run this
+    multiprocessing.freeze_support()
+
+    # run with --profile to write a profile of every stage of every directory, see
+    # utk_ContinuingPublications/profiling.py
+    if '--profile' in sys.argv[1:]:
+        default_run_profiler.start()
+
     # https://stackoverflow.com/a/14119223
     root = tk.Tk()
     root.withdraw()  # NO tk root window pop-up
@@ -108,10 +120,15 @@ if __name__ == "__main__":
 
     print(f'Root directory: {root_directory_path}')
 
-    for directory_path in [x for x in root_directory_path.iterdir() if x.is_dir()]:
-        print(f'Processing {directory_path}')
+    try:
+        for directory_path in [x for x in root_directory_path.iterdir() if x.is_dir()]:
+            print(f'Processing {directory_path}')
 
-        # rename files to match <directory_name>_0001.tif
-        renamed_files_directory_path = rename_files_to_directory_name(directory_path)
+            # rename files to match <directory_name>_0001.tif
+            with default_run_profiler.stage(directory_path.name, 'rename'):
+                renamed_files_directory_path = rename_files_to_directory_name(directory_path)
 
-        create_subdirectories_for_ingest(renamed_files_directory_path)
+            with default_run_profiler.stage(directory_path.name, 'ingest_layout'):
+                create_subdirectories_for_ingest(renamed_files_directory_path)
+    finally:  # keep the profile of a run that crashed or was stopped
+        default_run_profiler.finish()